@@ -0,0 +1,95 @@
+"""
+Checks that a stalled external dependency does not slow down unrelated endpoints.
+
+SMTP is replaced with a server that hangs for a few seconds, and a burst of admin
+requests that send email is fired at the app. Meanwhile, member form pages (which only
+touch DynamoDB) are requested and their latency is compared with an idle baseline.
+DynamoDB and OpenStack are stubbed out, so no credentials are needed.
+
+Run from the repository root (needs config/options.yml with a JWT secret):
+    python3 -m benchmarks.concurrency
+"""
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from jose import jwt
+
+import index
+from models.user import UserModel
+from util.approve import Approve
+from util.database import members
+from util.email import Email
+from util.options import Options
+
+options = Options.fetch()
+
+STALL_SECONDS = 3
+STALLED_REQUESTS = 20
+PROBES = 50
+
+member = UserModel(
+    id="bench", discord_id="1", discord={"username": "bench"}, first_name="Bench"
+).dict()
+
+
+class StubDynamoDB:
+    def get_item(self, **kwargs):
+        return {"Item": members.serialize(member)}
+
+    def update_item(self, **kwargs):
+        return {}
+
+
+def token(sudo=False):
+    return jwt.encode(
+        {"id": "bench", "sudo": sudo, "issued": time.time(), "name": "b", "pfp": ""},
+        options.get("jwt").get("secret"),
+        algorithm=options.get("jwt").get("algorithm"),
+    )
+
+
+async def probe(client, n):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        r = await client.get("/join/2/", cookies={"token": token()})
+        r.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:>10}: p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms")
+
+
+async def main():
+    logging.disable(logging.INFO)
+    members.client = StubDynamoDB()
+    members.cache = None
+    Email.deliver = lambda *args: time.sleep(STALL_SECONDS)
+    Approve.create_infra_account = lambda *args, **kwargs: None
+
+    transport = httpx.ASGITransport(app=index.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report("idle", await probe(client, PROBES))
+
+        admin = {"token": token(sudo=True)}
+        stalled = [
+            asyncio.create_task(
+                client.get("/admin/infra/?member_id=bench", cookies=admin)
+            )
+            for _ in range(STALLED_REQUESTS)
+        ]
+        await asyncio.sleep(0.1)
+        report("stalled", await probe(client, PROBES))
+
+        await asyncio.gather(*stalled)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
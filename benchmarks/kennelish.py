@@ -0,0 +1,74 @@
+"""
+Compares rendering every form in forms/ with Kennelish.parse (walks the JSON on each
+page view) and with the templates Kennelish.compile builds once per form (fills in
+the member's prefill values only). Fails if the two render anything differently.
+
+Run from the repository root (needs config/options.yml):
+    python3 -m benchmarks.kennelish
+"""
+import logging
+import time
+
+from models.user import UserModel
+from util.forms import forms
+from util.kennelish import Kennelish
+
+ROUNDS = 2000
+
+MEMBERS = [
+    {},
+    UserModel(
+        id="00000000-0000-4000-8000-000000000000",
+        discord_id="100000000000000000",
+        discord={"username": "member", "email": "member@discord.example"},
+        first_name="First",
+        surname="Last",
+        email="member@ucf.edu",
+        nid="ab123456",
+        experience=3,
+        major="Computer Science",
+        class_standing="Junior",
+        did_pay_dues=True,
+    ).dict(),
+]
+
+
+def timed(render, body):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        render(body)
+    return time.perf_counter() - start
+
+
+def main():
+    # The empty member hits the malformed-element paths on purpose; don't log them.
+    logging.disable(logging.CRITICAL)
+
+    member = MEMBERS[-1]
+    print(f"{'form':<20}{'parse':>12}{'compiled':>12}{'speedup':>10}")
+
+    total_parse = total_compiled = 0
+    for form_id in sorted(forms.forms):
+        form = forms.get(form_id)
+        for user_data in MEMBERS:
+            assert Kennelish.parse(form.body, user_data) == form.template.render(
+                user_data
+            ), f"compiled {form_id} renders differently"
+
+        parse = timed(lambda body: Kennelish.parse(body, member), form.body)
+        compiled = timed(lambda body: form.template.render(member), form.body)
+        total_parse += parse
+        total_compiled += compiled
+        print(
+            f"{form_id:<20}{parse / ROUNDS * 1e6:>10.1f}us"
+            f"{compiled / ROUNDS * 1e6:>10.1f}us{parse / compiled:>9.1f}x"
+        )
+
+    print(
+        f"{'all forms':<20}{total_parse / ROUNDS * 1e6:>10.1f}us"
+        f"{total_compiled / ROUNDS * 1e6:>10.1f}us{total_parse / total_compiled:>9.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
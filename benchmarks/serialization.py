@@ -0,0 +1,82 @@
+"""
+Compares the old and new ways of turning raw DynamoDB items into a JSON response.
+
+Old: boto3's TypeDeserializer (every number becomes a Decimal), then FastAPI's
+jsonable_encoder and json.dumps, which is what returning a dict from a route does.
+New: the typed deserializer in util.database, then orjson via FastJSONResponse.
+
+The roster is synthetic, so no AWS credentials are needed.
+
+Run from the repository root (needs config/options.yml):
+    python3 -m benchmarks.serialization
+"""
+import json
+import random
+import time
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from fastapi.encoders import jsonable_encoder
+
+from models.user import UserModel
+from util.database import members
+from util.responses import dumps
+
+MEMBERS = 5000
+ROUNDS = 5
+
+
+def roster():
+    serializer = TypeSerializer()
+    items = []
+    for i in range(MEMBERS):
+        member = UserModel(
+            id=f"{i:08x}-0000-4000-8000-000000000000",
+            discord_id=str(10**17 + i),
+            discord={"username": f"member{i}", "avatar": "https://cdn/x.png"},
+            ucf_id=5000000 + i,
+            nid=f"ab{i:06d}",
+            first_name="First",
+            surname="Last",
+            email=f"member{i}@ucf.edu",
+            phone_number=4075550000 + i,
+            experience=random.randint(1, 5),
+            join_date=1700000000 + i,
+            ethics_form={"signtime": 1700000000000 + i, "hack_others": True},
+        ).dict()
+        items.append({k: serializer.serialize(v) for k, v in member.items()})
+    return items
+
+
+def old_path(items):
+    deserializer = TypeDeserializer()
+    data = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in items]
+    return json.dumps(
+        jsonable_encoder({"data": data}),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def new_path(items):
+    return dumps({"data": [members.deserialize(item) for item in items]})
+
+
+def timed(func, items):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        body = func(items)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(body)
+
+
+def main():
+    items = roster()
+    for name, func in (("old", old_path), ("new", new_path)):
+        ms, size = timed(func, items)
+        print(f"{name:>4}: {ms:8.2f} ms for {MEMBERS} members ({size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
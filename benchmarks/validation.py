@@ -0,0 +1,65 @@
+"""
+Compares validating a form submission by building the pydantic model from the
+Kennelish body on every request (what post_form used to do) with using the model the
+form registry builds once per form version.
+
+Run from the repository root (needs config/options.yml):
+    python3 -m benchmarks.validation
+"""
+import time
+
+from util.forms import forms
+from util.kennelish import Transformer
+
+FORMS = ["ethics_form", "mentee"]
+ROUNDS = 2000
+
+
+def submission(body):
+    """
+    A valid answer for every keyed element of a Kennelish body.
+    """
+    answers = {}
+    for el in body:
+        kind = el.get("input")
+        if kind in ("h1", "h2"):
+            answers.update(submission(el.get("elements") or []))
+        elif el.get("key") is None:
+            continue
+        elif kind in ("radio", "dropdown") and el.get("options"):
+            answers[el["key"]] = el["options"][0]
+        elif kind == "email":
+            answers[el["key"]] = f"member@{el.get('domain') or 'example.com'}"
+        elif kind == "nid":
+            answers[el["key"]] = "ab123456"
+        elif kind == "slider":
+            answers[el["key"]] = 3
+        else:
+            answers[el["key"]] = "answer"
+    return answers
+
+
+def timed(validate):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        validate()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    print(f"{'form':<15}{'rebuilt':>12}{'cached':>12}{'speedup':>10}")
+    for form_id in FORMS:
+        form = forms.get(form_id)
+        answers = submission(form.body)
+        form.model(**answers)
+
+        rebuilt = timed(lambda: Transformer.kennelish_to_pydantic(form.body)(**answers))
+        cached = timed(lambda: forms.model(form_id)(**answers))
+        print(
+            f"{form_id:<15}{rebuilt * 1e6:>10.1f}us{cached * 1e6:>10.1f}us"
+            f"{rebuilt / cached:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import json
+import asyncio
 import logging
 import os
 import time
@@ -6,30 +6,40 @@ import uuid
 from typing import Optional
 from urllib.parse import urlparse
 
-import boto3
-import requests
-from boto3.dynamodb.conditions import Attr
 # FastAPI
-from fastapi import Cookie, FastAPI, Request, Response, status
+from fastapi import Cookie, Depends, FastAPI, Request, Response, status
 from fastapi.responses import FileResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from jose import jwt
 from requests_oauthlib import OAuth2Session
 
 # Import data types
 from models.user import UserModel
 # Import routes
 from routes import admin, api, infra, stripe, wallet
+from util.aio import http, run_sync
 from util.approve import Approve
 # Import middleware
-from util.authentication import Authentication
+from util.authentication import Authentication, get_claims
+# Import the member change feed
+from util.changefeed import changes
+# Import the shared member table
+from util.database import members
+from util.discord import Discord
 # Import error handling
 from util.errors import Errors
-# Import the page rendering library
-from util.kennelish import Kennelish
+# Import the form registry (compiled Kennelish pages)
+from util.forms import forms as form_registry
 # Import options
-from util.options import Options
+from util.options import Options, settings_file
+# Import revoked tokens
+from util.revocation import revocations
+# Import the admin roster index
+from util.roster import roster
+# Import login sessions
+from util.sessions import sessions
+# Import the admin stats
+from util.stats import stats
 
 ### TODO: TEMP
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "0"
@@ -54,6 +64,26 @@ app.include_router(admin.router)
 app.include_router(wallet.router)
 app.include_router(infra.router)
 
+
+@app.on_event("startup")
+async def startup():
+    settings_file().watch()
+    form_registry.watch(options.reload.watch_interval)
+    changes.start()
+    revocations.start()
+
+    # Warm the admin search index in the background; requests that need it wait.
+    asyncio.ensure_future(roster.ensure_ready())
+    asyncio.ensure_future(stats.reconcile_forever())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    changes.close()
+    revocations.close()
+    await http.aclose()
+
+
 # Create the OpenStack SDK config.
 with open("clouds.yaml", "w", encoding="utf-8") as f:
     f.write(
@@ -77,25 +107,16 @@ Render the Onboard home page.
 
 
 @app.get("/")
-async def index(request: Request, token: Optional[str] = Cookie(None)):
-    is_full_member = False
-    is_admin = False
-    user_id = None
-    infra_email = None
-
-    try:
-        user_jwt = jwt.decode(
-            token,
-            options.get("jwt").get("secret"),
-            algorithms=options.get("jwt").get("algorithm"),
-        )
-        is_full_member: bool = user_jwt.get("is_full_member", False)
-        is_admin: bool = user_jwt.get("sudo", False)
-        user_id: bool = user_jwt.get("id", None)
-        infra_email: bool = user_jwt.get("infra_email", None)
-    except Exception as e:
-        logger.exception(e)
-        pass
+async def index(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    user_jwt: Optional[dict] = Depends(get_claims),
+):
+    user_jwt = user_jwt or {}
+    is_full_member: bool = user_jwt.get("is_full_member", False)
+    is_admin: bool = user_jwt.get("sudo", False)
+    user_id: bool = user_jwt.get("id", None)
+    infra_email: bool = user_jwt.get("infra_email", None)
 
     return templates.TemplateResponse(
         "index.html",
@@ -154,10 +175,6 @@ async def oauth_transformer_new(
     redir: str = "/join/2",
     redir_endpoint: Optional[str] = Cookie(None),
 ):
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
     # Open redirect check
     if redir == "_redir":
         redir = redir_endpoint
@@ -181,10 +198,12 @@ async def oauth_transformer_new(
     oauth = OAuth2Session(
         options.get("discord").get("client_id"),
         redirect_uri=options.get("discord").get("redirect_base") + "_redir",
-        scope=options.get("discord")["scope"],
+        scope=options.get("discord").get("scope"),
     )
 
-    token = oauth.fetch_token(
+    # requests-oauthlib blocks, so these run on a worker thread.
+    token = await run_sync(
+        oauth.fetch_token,
         "https://discord.com/api/oauth2/token",
         client_id=options.get("discord").get("client_id"),
         client_secret=options.get("discord").get("secret"),
@@ -192,35 +211,15 @@ async def oauth_transformer_new(
         code=code,
     )
 
-    r = oauth.get("https://discord.com/api/users/@me")
+    r = await run_sync(oauth.get, "https://discord.com/api/users/@me")
     discordData = r.json()
 
     # Generate a new user ID or reuse an existing one.
-    query_for_id = table.scan(
-        FilterExpression=Attr("discord_id").eq(str(discordData["id"]))
-    )
-    query_for_id = query_for_id.get("Items")
-
-    # BACKPORT: I didn't realize that Snowflakes were strings because of an integer overflow bug.
-    # So this will do a query for the "mistaken" value and then fix its data.
-    if not query_for_id:
-        logger.info("Beginning Discord ID attribute migration...")
-        query_for_id = table.scan(
-            FilterExpression=Attr("discord_id").eq(int(discordData["id"]))
-        )
-        query_for_id = query_for_id.get("Items")
-
-        if query_for_id:
-            table.update_item(
-                Key={"id": query_for_id[0].get("id")},
-                UpdateExpression="SET discord_id = :discord_id",
-                ExpressionAttributeValues={":discord_id": str(discordData["id"])},
-            )
+    query_for_id = await members.get_by_discord_id(discordData["id"])
 
     is_new = False
 
     if query_for_id:
-        query_for_id = query_for_id[0]
         member_id = query_for_id.get("id")
         do_sudo = query_for_id.get("sudo")
         is_full_member = query_for_id.get("is_full_member")
@@ -233,22 +232,11 @@ async def oauth_transformer_new(
         infra_email = ""
 
         # Make user join the Hack@UCF Discord, if it's their first rodeo.
-        discord_id = str(discordData["id"])
-        headers = {
-            "Authorization": f"Bot {options.get('discord', {}).get('bot_token')}",
-            "Content-Type": "application/json",
-            "X-Audit-Log-Reason": "Hack@UCF OnboardLite Bot",
-        }
-        put_join_guild = {"access_token": token["access_token"]}
-        requests.put(
-            f"https://discordapp.com/api/guilds/{options.get('discord', {}).get('guild_id')}/members/{discord_id}",
-            headers=headers,
-            data=json.dumps(put_join_guild),
-        )
+        await Discord.add_member(discordData["id"], token["access_token"])
 
     data = {
         "id": member_id,
-        "discord_id": int(discordData["id"]),
+        "discord_id": str(discordData["id"]),
         "discord": {
             "email": discordData["email"],
             "mfa": discordData["mfa_enabled"],
@@ -269,15 +257,11 @@ async def oauth_transformer_new(
 
     # Push data back to DynamoDB
     if is_new:
-        table.put_item(Item=full_data)
+        await members.put(full_data)
     else:
-        table.update_item(
-            Key={"id": member_id},
-            UpdateExpression="SET discord = :discord",
-            ExpressionAttributeValues={":discord": full_data["discord"]},
-        )
+        await members.update(member_id, {"discord": full_data["discord"]})
 
-    # Create JWT. This should be the only way to issue JWTs.
+    # Create a session. This should be the only way to issue sessions.
     jwtData = {
         "discord": token,
         "name": discordData["username"],
@@ -288,13 +272,9 @@ async def oauth_transformer_new(
         "issued": time.time(),
         "infra_email": infra_email,
     }
-    bearer = jwt.encode(
-        jwtData,
-        options.get("jwt").get("secret"),
-        algorithm=options.get("jwt").get("algorithm"),
-    )
+    session_id = await run_sync(sessions.create, jwtData, pool="database")
     rr = RedirectResponse(redir, status_code=status.HTTP_302_FOUND)
-    rr.set_cookie(key="token", value=bearer)
+    rr.set_cookie(key="token", value=session_id, httponly=True, samesite="lax")
 
     # Clear redirect cookie.
     rr.delete_cookie("redir_endpoint")
@@ -328,13 +308,10 @@ async def profile(
     user_jwt: Optional[object] = {},
 ):
     # Get data from DynamoDB
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    user_data = await members.get(user_jwt.get("id"))
 
     # Re-run approval workflow.
-    Approve.approve_member(user_jwt.get("id"))
+    await Approve.approve_member(user_jwt.get("id"))
 
     return templates.TemplateResponse(
         "profile.html", {"request": request, "user_data": user_data}
@@ -354,20 +331,19 @@ async def forms(
     user_jwt: Optional[object] = {},
     num: str = 1,
 ):
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
     if num == "1":
         return RedirectResponse("/join/", status_code=status.HTTP_302_FOUND)
 
-    data = Options.get_form_body(num)
-
-    # Get data from DynamoDB
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    # In client-side mode, static/form.js fetches the form and the member's values.
+    form = form_registry.get(num)
+    if options.forms.client_render:
+        body = ""
+    else:
+        # Get data from DynamoDB
+        user_data = await members.get(user_jwt.get("id"))
 
-    # Have Kennelish parse the data.
-    body = Kennelish.parse(data, user_data)
+        # Fill the member's data into the compiled form.
+        body = form_registry.render(num, user_data)
 
     # return num
     return templates.TemplateResponse(
@@ -378,6 +354,8 @@ async def forms(
             "name": user_jwt["name"],
             "id": user_jwt["id"],
             "body": body,
+            "form": num if form and options.forms.client_render else None,
+            "version": form.version if form else None,
         },
     )
 
@@ -388,7 +366,10 @@ async def final(request: Request):
 
 
 @app.get("/logout")
-async def logout(request: Request):
+async def logout(request: Request, token: Optional[str] = Cookie(None)):
+    if token and sessions.is_session_id(token):
+        await run_sync(sessions.revoke, token, pool="database")
+
     rr = RedirectResponse("/", status_code=status.HTTP_302_FOUND)
     rr.delete_cookie(key="token")
     return rr
@@ -0,0 +1,138 @@
+import sys
+
+from pydantic.validators import bool_validator, int_validator, str_validator
+
+# (attribute path, type) for every field a MemberRecord holds, in UserModel terms.
+FIELDS = [
+    ("id", str),
+    ("version", int),
+    ("first_name", str),
+    ("surname", str),
+    ("email", str),
+    ("infra_email", str),
+    ("nid", str),
+    ("experience", int),
+    ("major", str),
+    ("class_standing", str),
+    ("sudo", bool),
+    ("ops_email", str),
+    ("can_vote", bool),
+    ("did_pay_dues", bool),
+    ("did_get_shirt", bool),
+    ("is_full_member", bool),
+    ("join_date", int),
+    ("discord.username", str),
+    ("discord.avatar", str),
+    ("mentee.domain_interest", str),
+    ("ethics_form.signtime", int),
+    ("cyberlab_monitor.signtime", int),
+]
+
+# Values shared by many members, stored once.
+INTERNED = {"major", "class_standing", "mentee.domain_interest"}
+
+
+def slot(path: str) -> str:
+    return path.replace(".", "__")
+
+
+# (slot, parent map names, attribute name, type, interned) for from_item.
+PLAN = [
+    (slot(path), path.split(".")[:-1], path.split(".")[-1], kind, path in INTERNED)
+    for path, kind in FIELDS
+]
+
+
+# pydantic's own validators, so "false" is False and a map is never a str here either.
+VALIDATORS = {str: str_validator, int: int_validator, bool: bool_validator}
+
+
+def coerce(value, kind):
+    """
+    Validates a value against its field type, converting where UserModel would. Values
+    that can't be converted (including maps and lists) are dropped.
+    """
+    if value is None or type(value) is kind:
+        return value
+    try:
+        return VALIDATORS[kind](value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MemberRecord:
+    """
+    Compact, read-only summary of a member for code that holds the whole roster in
+    memory (the admin search index, stats reconciliation).
+
+    A UserModel-shaped dict costs a dict per nested model plus a hash table per record;
+    this is one slotted object with a fixed set of fields, a fraction of the size.
+    Build one with `MemberRecord.from_item()` from a record (or a projection of one)
+    returned by util.database; `dict()` gives the nested shape back for JSON.
+    """
+
+    __slots__ = tuple(slot(path) for path, _ in FIELDS)
+
+    @classmethod
+    def paths(cls) -> list:
+        """
+        The attribute paths to project when fetching items for MemberRecords.
+        """
+        return [path for path, _ in FIELDS]
+
+    @classmethod
+    def from_item(cls, item: dict):
+        record = cls.__new__(cls)
+        for name, parents, last, kind, interned in PLAN:
+            value = item
+            for part in parents:
+                value = value.get(part) if isinstance(value, dict) else None
+            value = value.get(last) if isinstance(value, dict) else None
+
+            value = coerce(value, kind)
+            if interned and value is not None:
+                value = sys.intern(value)
+            object.__setattr__(record, name, value)
+
+        if not record.id:
+            raise ValueError("Member record has no id")
+        return record
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MemberRecord is read-only")
+
+    def get(self, path: str, default=None):
+        """
+        Reads a field by attribute path, like dict.get on the item it came from.
+        """
+        value = getattr(self, slot(path), None)
+        return default if value is None else value
+
+    def dict(self) -> dict:
+        """
+        Returns the record in the nested shape of a projected item. Like a projection,
+        fields the item didn't have are left out rather than set to None.
+        """
+        result = {}
+        for name, parents, last, _, _ in PLAN:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            target = result
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[last] = value
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, MemberRecord):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"MemberRecord(id={self.id!r}, version={self.version!r})"
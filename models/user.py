@@ -95,6 +95,9 @@ class UserModel(BaseModel):
     attending: Optional[str] = ""
     comments: Optional[str] = ""
 
+    # Bumped on every write, for optimistic concurrency.
+    version: Optional[int] = 0
+
 
 # What admins can edit.
 class UserModelMutable(BaseModel):
@@ -140,6 +143,10 @@ class UserModelMutable(BaseModel):
     attending: Optional[str]
     comments: Optional[str]
 
+    # The record version the edit is based on. If set, the edit is rejected when
+    # someone else has changed the member since.
+    version: Optional[int]
+
 
 class PublicContact(BaseModel):
     first_name: str
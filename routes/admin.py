@@ -1,19 +1,27 @@
+import csv
+import io
+import re
 from typing import Optional
 
-import boto3
-from boto3.dynamodb.conditions import Attr
-from fastapi import APIRouter, Body, Cookie, Request, Response
+from fastapi import APIRouter, Body, Cookie, Depends, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
-from jose import jwt
 
 from models.user import UserModelMutable
+from util.aio import run_sync
 from util.approve import Approve
-from util.authentication import Authentication
+from util.authentication import Authentication, get_claims, tokens
+from util.database import VersionConflict, members
 from util.discord import Discord
 from util.email import Email
 from util.errors import Errors
 from util.options import Options
+from util.responses import FastJSONResponse, dumps
+from util.revocation import revocations
+from util.roster import roster
+from util.sessions import sessions
+from util.stats import stats
 
 options = Options.fetch()
 
@@ -22,17 +30,42 @@ templates = Jinja2Templates(directory="templates")
 router = APIRouter(prefix="/admin", tags=["Admin"], responses=Errors.basic_http())
 
 
+# What ?fields= on /admin/list accepts: attribute names, optionally dotted.
+ATTRIBUTE_PATH = re.compile(r"[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*")
+
+# Column key -> (CSV header, attribute path), in export order.
+CSV_COLUMNS = {
+    "id": ("Membership ID", "id"),
+    "first_name": ("First Name", "first_name"),
+    "surname": ("Last Name", "surname"),
+    "nid": ("NID", "nid"),
+    "is_returning": ("Is Returning", "is_returning"),
+    "gender": ("Gender", "gender"),
+    "major": ("Major", "major"),
+    "class_standing": ("Class Standing", "class_standing"),
+    "shirt_size": ("Shirt Size", "shirt_size"),
+    "discord_username": ("Discord Username", "discord.username"),
+    "experience": ("Experience", "experience"),
+    "curiosity": ("Cyber Interests", "curiosity"),
+    "attending": ("Event Interest", "attending"),
+    "c3_interest": ("Is C3 Interest", "c3_interest"),
+    "comments": ("Comments", "comments"),
+    "ethics_form_signtime": ("Ethics Form Timestamp", "ethics_form.signtime"),
+    "minecraft": ("Minecraft", "minecraft"),
+    "infra_email": ("Infra Email", "infra_email"),
+}
+
+
 @router.get("/")
 @Authentication.admin
-async def admin(request: Request, token: Optional[str] = Cookie(None)):
+async def admin(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    payload: dict = Depends(get_claims),
+):
     """
     Renders the Admin home page.
     """
-    payload = jwt.decode(
-        token,
-        options.get("jwt").get("secret"),
-        algorithms=options.get("jwt").get("algorithm"),
-    )
     return templates.TemplateResponse(
         "admin_searcher.html",
         {
@@ -57,7 +90,7 @@ async def get_infra(
     if member_id == "FAIL":
         return {"username": "", "password": "", "error": "Missing ?member_id"}
 
-    creds = Approve.provision_infra(member_id)
+    creds = await Approve.provision_infra(member_id)
     if creds is None:
         creds = {}
 
@@ -65,10 +98,7 @@ async def get_infra(
         return Errors.generate(request, 404, "User Not Found")
 
     # Get user data
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
-    user_data = table.get_item(Key={"id": member_id}).get("Item", None)
+    user_data = await members.get(member_id, attributes=["first_name", "email"])
 
     # Send DM...
     new_creds_msg = f"""Hello {user_data.get('first_name')},
@@ -92,7 +122,9 @@ Happy Hacking,
 
     # Send Discord message
     #Discord.send_message(user_data.get("discord_id"), new_creds_msg)
-    Email.send_email("Hack@UCF Private Cloud Credentials", new_creds_msg, user_data.get("email"))
+    await Email.send_email(
+        "Hack@UCF Private Cloud Credentials", new_creds_msg, user_data.get("email")
+    )
     return {"username": creds.get("username"), "password": creds.get("password")}
 
 
@@ -109,11 +141,9 @@ async def get_refresh(
     if member_id == "FAIL":
         return {"data": {}, "error": "Missing ?member_id"}
 
-    Approve.approve_member(member_id)
+    await Approve.approve_member(member_id)
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.get_item(Key={"id": member_id}).get("Item", None)
+    data = await members.get(member_id, consistent=True)
 
     if not data:
         return Errors.generate(request, 404, "User Not Found")
@@ -121,6 +151,71 @@ async def get_refresh(
     return {"data": data}
 
 
+@router.post("/refresh/bulk")
+@Authentication.admin
+async def post_refresh_bulk(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    payload: dict = Body(None),
+):
+    """
+    API endpoint that re-runs the member verification workflow for many members,
+    given {"member_ids": [...]}. Only newly-eligible members get side effects.
+    """
+    member_ids = (payload or {}).get("member_ids")
+    if not isinstance(member_ids, list) or not all(
+        isinstance(member_id, str) for member_id in member_ids
+    ):
+        return {"data": {}, "error": "Missing member_ids"}
+
+    if len(member_ids) > 1000:
+        return {"data": {}, "error": "At most 1000 members at a time"}
+
+    return {"data": await Approve.approve_members(member_ids)}
+
+
+@router.post("/sessions/revoke/")
+@Authentication.admin
+async def post_revoke_sessions(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    member_id: Optional[str] = "FAIL",
+):
+    """
+    API endpoint that immediately logs a member out everywhere.
+    """
+    if member_id == "FAIL":
+        return {"data": {}, "error": "Missing ?member_id"}
+
+    revoked = await run_sync(sessions.revoke_member, member_id, pool="database")
+    return {"data": {"revoked": revoked}, "msg": "Sessions revoked."}
+
+
+@router.post("/tokens/revoke/")
+@Authentication.admin
+async def post_revoke_token(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    payload: dict = Body(None),
+):
+    """
+    API endpoint that revokes a (legacy JWT) login token, given {"token": "..."}.
+    """
+    leaked = (payload or {}).get("token")
+    try:
+        claims = tokens.decode(leaked)
+    except Exception:
+        return {"data": {}, "error": "Not a valid token"}
+
+    await run_sync(
+        revocations.revoke,
+        leaked,
+        claims.get("issued", 0) + options.jwt.lifetime.user,
+        pool="database",
+    )
+    return {"data": {"id": claims.get("id")}, "msg": "Token revoked."}
+
+
 @router.get("/get/")
 @Authentication.admin
 async def admin_get_single(
@@ -134,14 +229,12 @@ async def admin_get_single(
     if member_id == "FAIL":
         return {"data": {}, "error": "Missing ?member_id"}
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.get_item(Key={"id": member_id}).get("Item", None)
+    data = await members.get(member_id)
 
     if not data:
         return Errors.generate(request, 404, "User Not Found")
 
-    return {"data": data}
+    return FastJSONResponse({"data": data})
 
 
 @router.get("/get_by_snowflake/")
@@ -158,24 +251,12 @@ async def admin_get_snowflake(
     if discord_id == "FAIL":
         return {"data": {}, "error": "Missing ?discord_id"}
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.scan(FilterExpression=Attr("discord_id").eq(str(discord_id))).get(
-        "Items"
-    )
+    data = await members.get_by_discord_id(discord_id)
 
     if not data:
-        # Try a legacy-user-ID search (deprecated, but still neccesary)
-        data = table.scan(FilterExpression=Attr("discord_id").eq(int(discord_id))).get(
-            "Items"
-        )
-
-        if not data:
-            return Errors.generate(request, 404, "User Not Found")
-
-    data = data[0]
+        return Errors.generate(request, 404, "User Not Found")
 
-    return {"data": data}
+    return FastJSONResponse({"data": data})
 
 
 @router.post("/message/")
@@ -192,16 +273,14 @@ async def admin_post_discord_message(
     if member_id == "FAIL":
         return {"data": {}, "error": "Missing ?member_id"}
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.get_item(Key={"id": member_id}).get("Item", None)
+    data = await members.get(member_id, attributes=["discord_id"])
 
     if not data:
         return Errors.generate(request, 404, "User Not Found")
 
     message_text = user_jwt.get("msg")
 
-    res = Discord.send_message(data.get("discord_id"), message_text)
+    res = await Discord.send_message(data.get("discord_id"), message_text)
 
     if res:
         return {"msg": "Message sent."}
@@ -221,73 +300,208 @@ async def admin_edit(
     """
     member_id = input_data.id
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    old_data = table.get_item(Key={"id": member_id}).get("Item", None)
+    old_data = await members.get(member_id, consistent=True)
 
     if not old_data:
         return Errors.generate(request, 404, "User Not Found")
 
     # Take Pydantic data -> dict -> strip null values
     new_data = {k: v for k, v in jsonable_encoder(input_data).items() if v is not None}
+    expected_version = new_data.pop("version", old_data.get("version", 0))
+
+    # Only send what actually changed.
+    diff = {
+        k: v for k, v in new_data.items() if k != "id" and old_data.get(k) != v
+    }
+
+    if not diff:
+        return {"data": old_data, "msg": "Nothing to update."}
+
+    try:
+        data = await members.update(
+            member_id, diff, expected_version=int(expected_version)
+        )
+    except VersionConflict:
+        return Errors.generate(
+            request,
+            409,
+            "This member was changed by someone else.",
+            essay="Reload the member and try your edit again.",
+        )
+
+    return {"data": data, "msg": "Updated successfully!"}
 
-    # Existing  U  Provided
-    union = {**old_data, **new_data}
 
-    # This is how this works:
-    # 1. Get old data
-    # 2. Get new data (pydantic-validated)
-    # 3. Union the two
-    # 4. Put back as one giant entry
+@router.get("/search")
+@Authentication.admin
+async def admin_search(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    q: Optional[str] = "",
+    limit: Optional[int] = 50,
+):
+    """
+    API endpoint that searches members by name, NID, Discord username or email.
 
-    table.put_item(Item=union)
+    Served from the in-memory roster index, so only matching summaries are returned.
+    """
+    await roster.ensure_ready()
 
-    return {"data": union, "msg": "Updated successfully!"}
+    limit = max(1, min(limit, 500))
+    return FastJSONResponse(
+        {"data": roster.search(q, limit=limit), "total": len(roster.records)}
+    )
+
+
+@router.get("/stats")
+@Authentication.admin
+async def admin_stats(request: Request, token: Optional[str] = Cookie(None)):
+    """
+    API endpoint that returns roster counts (dues, full members, shirts, majors, class
+    standing). Served from counters kept current on every write.
+    """
+    await stats.ensure_ready()
+
+    return {"data": stats.snapshot(), "reconciled": stats.reconciled_at}
 
 
 @router.get("/list")
 @Authentication.admin
-async def admin_list(request: Request, token: Optional[str] = Cookie(None)):
+async def admin_list(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    format: Optional[str] = "json",
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    did_pay_dues: Optional[bool] = None,
+    is_full_member: Optional[bool] = None,
+    did_get_shirt: Optional[bool] = None,
+    class_standing: Optional[str] = None,
+):
     """
     API endpoint that dumps all users as JSON.
+
+    The response is streamed while the table is being scanned. By default it is a single
+    `{"data": [...]}` document; pass ?format=ndjson to get one member per line instead.
+    Pass ?fields=id,first_name,discord.username,... to only fetch those attributes.
+
+    Passing ?limit=, ?cursor=, ?sort= or any filter (did_pay_dues, is_full_member,
+    did_get_shirt, class_standing) instead returns one page of member summaries from the
+    roster index, ordered by join_date (sort=-join_date for newest first), as
+    `{"data": [...], "next": cursor, "total": n}`, where `total` counts every member
+    passing the filters. Pass `next` back as ?cursor= for the next page. Bad parameters
+    get a JSON `{"detail": ...}` 400.
     """
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.scan().get("Items", None)
-    return {"data": data}
+    filters = {
+        key: value
+        for key, value in {
+            "did_pay_dues": did_pay_dues,
+            "is_full_member": is_full_member,
+            "did_get_shirt": did_get_shirt,
+            "class_standing": class_standing,
+        }.items()
+        if value is not None
+    }
+
+    if limit is not None or cursor or sort or filters:
+        if sort not in (None, "join_date", "-join_date"):
+            raise HTTPException(status_code=400, detail="Unknown sort key.")
+
+        await roster.ensure_ready()
+
+        try:
+            data, next_cursor, total = roster.page(
+                cursor=cursor,
+                limit=max(1, min(limit or 50, 500)),
+                descending=sort == "-join_date",
+                filters=filters,
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Malformed cursor.")
+
+        return FastJSONResponse({"data": data, "next": next_cursor, "total": total})
+
+    ndjson = format == "ndjson"
+
+    projection = {}
+    if fields:
+        attributes = [field.strip() for field in fields.split(",") if field.strip()]
+        if not all(ATTRIBUTE_PATH.fullmatch(field) for field in attributes):
+            raise HTTPException(status_code=400, detail="Malformed field list.")
+        projection = members.projection(attributes)
+
+    def stream():
+        if not ndjson:
+            yield b'{"data": ['
+
+        separator = b""
+        for member in members.scan_iter(**projection):
+            yield separator + dumps(member)
+            separator = b"\n" if ndjson else b","
+
+        yield b"\n" if ndjson else b"]}"
+
+    return StreamingResponse(
+        stream(), media_type="application/x-ndjson" if ndjson else "application/json"
+    )
 
 
 @router.get("/csv")
 @Authentication.admin
-async def admin_list_csv(request: Request, token: Optional[str] = Cookie(None)):
+async def admin_list_csv(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    columns: Optional[str] = None,
+):
     """
     API endpoint that dumps all users as CSV.
+
+    Pass ?columns=id,first_name,... (keys of CSV_COLUMNS) to export only some columns;
+    only those attributes are read from DynamoDB. The file is streamed as the table is
+    scanned.
     """
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-    data = table.scan().get("Items", None)
-
-    output = "Membership ID, First Name, Last Name, NID, Is Returning, Gender, Major, Class Standing, Shirt Size, Discord Username, Experience, Cyber Interests, Event Interest, Is C3 Interest, Comments, Ethics Form Timestamp, Minecraft, Infra Email\n"
-    for user in data:
-        output += f'"{user.get("id")}", '
-        output += f'"{user.get("first_name")}", '
-        output += f'"{user.get("surname")}", '
-        output += f'"{user.get("nid")}", '
-        output += f'"{user.get("is_returning")}", '
-        output += f'"{user.get("gender")}", '
-        output += f'"{user.get("major")}", '
-        output += f'"{user.get("class_standing")}", '
-        output += f'"{user.get("shirt_size")}", '
-        output += f'"{user.get("discord", {}).get("username")}", '
-        output += f'"{user.get("experience")}", '
-        output += f'"{user.get("curiosity")}", '
-        output += f'"{user.get("attending")}", '
-        output += f'"{user.get("c3_interest")}", '
-
-        output += f'"{user.get("comments")}", '
-
-        output += f'"{user.get("ethics_form", {}).get("signtime")}", '
-        output += f'"{user.get("minecraft")}", '
-        output += f'"{user.get("infra_email")}"\n'
-
-    return Response(content=output, headers={"Content-Type": "text/csv"})
+    if columns:
+        keys = [key.strip() for key in columns.split(",") if key.strip()]
+        unknown = [key for key in keys if key not in CSV_COLUMNS]
+        if unknown or not keys:
+            return Errors.generate(
+                request,
+                400,
+                "Unknown CSV column(s).",
+                essay=f"Valid columns are: {', '.join(CSV_COLUMNS)}",
+            )
+    else:
+        keys = list(CSV_COLUMNS)
+
+    selected = [CSV_COLUMNS[key] for key in keys]
+    projection = members.projection(list({path for _, path in selected}))
+
+    def stream():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _ in selected])
+
+        for user in members.scan_iter(**projection):
+            row = []
+            for _, path in selected:
+                value = user
+                for part in path.split("."):
+                    value = value.get(part) if isinstance(value, dict) else None
+                row.append(value)
+            writer.writerow(row)
+
+            # Flush in chunks rather than per row.
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="members.csv"'},
+    )
@@ -1,23 +1,57 @@
 import json
 from typing import Optional
 
-import boto3
-from botocore.exceptions import ClientError
-from fastapi import APIRouter, Cookie, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Cookie, Request, Response
+from fastapi.responses import HTMLResponse, RedirectResponse
 from pydantic import error_wrappers
 
 from models.info import InfoModel
-from models.user import PublicContact
+from models.user import PublicContact, UserModel
 from util.authentication import Authentication
+from util.database import VersionConflict, members
 from util.errors import Errors
-from util.kennelish import Kennelish, Transformer
+from util.forms import forms
 from util.options import Options
+from util.responses import FastJSONResponse
 
 options = Options.fetch()
 
 router = APIRouter(prefix="/api", tags=["API"], responses=Errors.basic_http())
 
+# How many times post_form re-reads and retries after a concurrent write.
+FORM_WRITE_ATTEMPTS = 3
+
+
+def changed_fields(user_data, fields):
+    """
+    Turns validated form fields into the attributes that actually need writing.
+
+    Dotted keys ("ethics_form.signtime") are folded into their parent map, which is
+    written whole: the stored map (or the model's defaults, if there is none yet) with
+    the new values on top. That way a missing parent never needs a separate write.
+    Anything that already has the submitted value is left out.
+    """
+    user_data = user_data or {}
+    updates = {}
+
+    for key, value in fields.items():
+        if "." in key:
+            parent, child = key.split(".", 1)
+            if parent not in updates:
+                default = UserModel.__fields__.get(parent)
+                default = default.default.dict() if default and default.default else {}
+                updates[parent] = {**default, **(user_data.get(parent) or {})}
+            updates[parent][child] = value
+        elif user_data.get(key) != value:
+            updates[key] = value
+
+    # Drop parent maps that came out identical to what is stored.
+    return {
+        k: v
+        for k, v in updates.items()
+        if not isinstance(v, dict) or user_data.get(k) != v
+    }
+
 
 """
 Get API information.
@@ -40,14 +74,69 @@ async def get_root():
 
 
 """
-Gets the JSON markup for a Kennelish file. For client-side rendering (if that ever becomes a thing).
+Gets the JSON markup for a Kennelish file. The ETag is the form's version, which also
+names the cacheable copy at /api/form/{num}/v/{version}.
 Note that Kennelish form files are NOT considered sensitive.
 """
 
 
 @router.get("/form/{num}")
-async def get_form(num: str):
-    return Options.get_form_body(num)
+async def get_form(request: Request, num: str):
+    form = forms.get(num)
+    if form is None:
+        return {}
+
+    headers = {"ETag": f'"{form.version}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(form.json, media_type="application/json", headers=headers)
+
+
+"""
+Gets one version of a Kennelish file, for client-side rendering (static/form.js). A
+version never changes, so browsers may keep it for good; asking for an old version
+redirects to the current one.
+"""
+
+
+@router.get("/form/{num}/v/{version}")
+async def get_form_version(request: Request, num: str, version: str):
+    form = forms.get(num)
+    if form is None:
+        return Errors.generate(request, 404, "Form Not Found")
+
+    if version != form.version:
+        return RedirectResponse(f"/api/form/{num}/v/{form.version}")
+
+    return Response(
+        form.json,
+        media_type="application/json",
+        headers={
+            "ETag": f'"{form.version}"',
+            "Cache-Control": "public, max-age=31536000, immutable",
+        },
+    )
+
+
+"""
+Gets the member's values for a Kennelish form rendered client-side: the only part of a
+form page that differs between members.
+"""
+
+
+@router.get("/form/{num}/prefill")
+@Authentication.member
+async def get_form_prefill(
+    request: Request,
+    token: Optional[str] = Cookie(None),
+    user_jwt: Optional[object] = {},
+    num: str = 1,
+):
+    user_data = await members.get(user_jwt.get("id"))
+
+    return FastJSONResponse(
+        forms.prefill(num, user_data), headers={"Cache-Control": "no-store"}
+    )
 
 
 """
@@ -63,18 +152,11 @@ async def get_form_html(
     user_jwt: Optional[object] = {},
     num: str = 1,
 ):
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
-    # Get form object
-    data = Options.get_form_body(num)
-
     # Get data from DynamoDB
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    user_data = await members.get(user_jwt.get("id"))
 
-    # Have Kennelish parse the data.
-    body = Kennelish.parse(data, user_data)
+    # Fill the member's data into the compiled form.
+    body = forms.render(num, user_data)
 
     return body
 
@@ -92,9 +174,8 @@ async def post_form(
     user_jwt: Optional[object] = {},
     num: str = 1,
 ):
-    # Get Kennelish data
-    kennelish_data = Options.get_form_body(num)
-    model = Transformer.kennelish_to_pydantic(kennelish_data)
+    # Get the form's validator, built when the form was loaded.
+    model = forms.model(num)
 
     # Parse and Validate inputs
     try:
@@ -127,52 +208,27 @@ async def post_form(
 
             items_to_keep.append(item)
 
-    update_expression = "SET "
-    expression_attribute_values = {}
-
     # Here, the variable 'items_to_keep' is validated input. We can update the user's profile from here.
-
-    # Prepare to update to DynamoDB
-    for item in items_to_keep:
-        update_expression += f"{item[0]} = :{item[0].replace('.', '_')}, "
-        expression_attribute_values[f":{item[0].replace('.', '_')}"] = item[1]
-
-    # Strip last comma for update_expression
-    update_expression = update_expression[:-2]
-
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
-    # Push data back to DynamoDB
-    try:
-        table.update_item(
-            Key={"id": user_jwt.get("id")},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-        )
-    except ClientError:
-        # We need to do a migration on *something*. We know it's a subtype.
-        # So we will find it and migrate it.
-        for item in items_to_keep:
-            if "." in item[0]:
-                dot_loc = item[0].find(".")
-                key_to_make = item[0][:dot_loc]
-
-                # Create dictionary
-                table.update_item(
-                    Key={"id": user_jwt.get("id")},
-                    # key_to_make is not user-supplied, rather, it's from the form JSON.
-                    # if this noSQLi's, then it's because of an insider threat.
-                    UpdateExpression=f"SET {key_to_make} = :dicty",
-                    ExpressionAttributeValues={":dicty": {}},
-                )
-
-        # After all dicts are a thing, re-run query.
-        table.update_item(
-            Key={"id": user_jwt.get("id")},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
+    fields = dict(items_to_keep)
+    attributes = list({key.split(".")[0] for key in fields} | {"version"})
+
+    # Parent maps are written whole, so read them consistently and only write if
+    # nobody changed the member in between; otherwise re-read and try again.
+    for _ in range(FORM_WRITE_ATTEMPTS):
+        user_data = await members.get(
+            user_jwt.get("id"), consistent=True, attributes=attributes
         )
+        try:
+            # Push data back to DynamoDB, in one request.
+            await members.update(
+                user_jwt.get("id"),
+                changed_fields(user_data, fields),
+                expected_version=int((user_data or {}).get("version") or 0),
+            )
+            break
+        except VersionConflict:
+            continue
+    else:
+        return {"description": "Your profile changed while saving. Please try again."}
 
     return validated
@@ -4,7 +4,6 @@ import logging
 import os
 from typing import Optional
 
-import boto3
 import openstack
 from fastapi import APIRouter, Cookie, Request
 from fastapi.responses import FileResponse
@@ -13,8 +12,10 @@ from python_terraform import Terraform
 
 from models.info import InfoModel
 from models.user import PublicContact
+from util.aio import run_sync
 from util.approve import Approve
 from util.authentication import Authentication
+from util.database import members
 from util.discord import Discord
 from util.email import Email
 from util.errors import Errors
@@ -71,7 +72,10 @@ async def create_resource(project, callback_discord_id=None):
         "imageid": shitty_database.get("imageId"),
         "member_username": project.id,
     }
-    return_code, stdout, stderr = tf.apply(var=tf_vars, skip_plan=True)
+    # Terraform blocks for minutes, so it runs on a worker thread.
+    return_code, stdout, stderr = await run_sync(
+        tf.apply, var=tf_vars, skip_plan=True
+    )
     if return_code != 0:
         logger.exception("Terraform failed!")
         logger.debug(f"\treturn: {return_code}")
@@ -96,12 +100,16 @@ Your requested virtual machine has been created! You can now view it at {options
 Enjoy,
     - Hack@UCF Bot
 """
-        Discord.send_message(callback_discord_id, resource_create_msg)
+        await Discord.send_message(callback_discord_id, resource_create_msg)
 
     logger.info("\tDone!")
 
 
-async def teardown():
+def teardown():
+    """
+    Deletes GBM-provisioned resources. The OpenStack SDK blocks, so run this on a
+    worker thread.
+    """
     logger.debug("Initializing post-GBM teardown...")
     death_word = "gbm"
 
@@ -114,7 +122,7 @@ async def teardown():
             logger.debug(f"\t\tdelete {resource.name}")
             conn.compute.delete_server(resource)
 
-    logger("\tSec Groups...")
+    logger.debug("\tSec Groups...")
     for resource in conn.network.security_groups():
         # logger.debug("\t" + resource.name)
         if death_word in resource.name.lower():
@@ -198,13 +206,16 @@ async def get_provision(
     token: Optional[str] = Cookie(None),
     user_jwt: Optional[object] = {},
 ):
-    conn = openstack.connect(cloud="hackucf_infra")
+    def find_project(infra_email):
+        conn = openstack.connect(cloud="hackucf_infra")
 
-    # Get single user
-    user = conn.identity.find_user(user_jwt.get("infra_email"))
+        # Get single user
+        user = conn.identity.find_user(infra_email)
 
-    # Get project
-    project = conn.identity.get_project(user.default_project_id)
+        # Get project
+        return conn.identity.get_project(user.default_project_id)
+
+    project = await run_sync(find_project, user_jwt.get("infra_email"))
 
     # Provision everything
     asyncio.create_task(
@@ -221,7 +232,7 @@ API endpoint to trigger tear-down of GBM-provisioned stuff.
 @router.get("/teardown/")
 @Authentication.admin
 async def get_teardown(request: Request, token: Optional[str] = Cookie(None)):
-    asyncio.create_task(teardown())  # runs teardown async
+    asyncio.create_task(run_sync(teardown))  # runs teardown async
     return {"msg": "Queued."}
 
 
@@ -283,16 +294,13 @@ async def get_infra(
 
     # This also reprovisions Infra access if an account already exists.
     # This is useful for cleaning up things + nuking in case of an error.
-    creds = Approve.provision_infra(member_id)
+    creds = await Approve.provision_infra(member_id)
 
     if not creds:
         creds = {}
 
     # Get user data
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
-    user_data = table.get_item(Key={"id": member_id}).get("Item", None)
+    user_data = await members.get(member_id, attributes=["first_name", "email"])
 
     # Send DM...
     new_creds_msg = f"""Hello {user_data.get('first_name')},
@@ -318,7 +326,9 @@ Happy Hacking,
     # Send Discord message
     # Discord.send_message(user_data.get("discord_id"), new_creds_msg)
     # Send Email
-    Email.send_email("Reset Infra Credentials", new_creds_msg, user_data.get("email"))
+    await Email.send_email(
+        "Reset Infra Credentials", new_creds_msg, user_data.get("email")
+    )
 
     return {"username": creds.get("username"), "password": creds.get("password")}
 
@@ -1,15 +1,15 @@
 import logging
 from typing import Optional
 
-import boto3
 import stripe
-from boto3.dynamodb.conditions import Attr
 from fastapi import APIRouter, Cookie, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
+from util.aio import run_sync
 from util.approve import Approve
 from util.authentication import Authentication
+from util.database import members
 from util.errors import Errors
 from util.options import Options
 
@@ -37,12 +37,10 @@ async def get_root(
     token: Optional[str] = Cookie(None),
     user_jwt: Optional[object] = {},
 ):
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
     # Get data from DynamoDB
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    user_data = await members.get(
+        user_jwt.get("id"), attributes=["did_pay_dues", "nid"]
+    )
 
     did_pay_dues = user_data.get("did_pay_dues", False)
 
@@ -68,16 +66,14 @@ async def create_checkout_session(
     token: Optional[str] = Cookie(None),
     user_jwt: Optional[object] = {},
 ):
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
     # Get data from DynamoDB
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    user_data = await members.get(user_jwt.get("id"), attributes=["email"])
 
     try:
         stripe_email = user_data.get("email")
-        checkout_session = stripe.checkout.Session.create(
+        # The Stripe SDK blocks, so it runs on a worker thread.
+        checkout_session = await run_sync(
+            stripe.checkout.Session.create,
             line_items=[
                 {
                     # Provide the exact Price ID (for example, pr_1234) of the product you want to sell
@@ -86,6 +82,9 @@ async def create_checkout_session(
                 },
             ],
             customer_email=stripe_email,
+            # Lets the webhook find the member without searching by email.
+            client_reference_id=user_jwt.get("id"),
+            metadata={"member_id": user_jwt.get("id")},
             mode="payment",
             success_url=options.get("stripe").get("url").get("success"),
             cancel_url=options.get("stripe").get("url").get("failure"),
@@ -121,36 +120,40 @@ async def webhook(request: Request):
 
         if session.payment_status == "paid":
             # Mark as paid.
-            pay_dues(session)
+            await pay_dues(session)
 
     elif event["type"] == "checkout.session.async_payment_succeeded":
         session = event["data"]["object"]
-        pay_dues(session)
+        await pay_dues(session)
 
     # Passed signature verification
     return HTTPException(status_code=200, detail="Success.")
 
 
-def pay_dues(session):
-    customer_email = session.get("customer_email")
-
-    # AWS dependencies
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
+async def pay_dues(session):
+    # Sessions we created carry the member ID. Older ones only have an email.
+    member_id = session.get("client_reference_id") or (
+        session.get("metadata") or {}
+    ).get("member_id")
+
+    if member_id:
+        user_data = await members.get(member_id, consistent=True, attributes=["id"])
+    else:
+        customer_email = session.get("customer_email") or (
+            session.get("customer_details") or {}
+        ).get("email")
+        user_data = (
+            await members.get_by_email(customer_email) if customer_email else None
+        )
 
-    # Get data from DynamoDB
-    response = table.scan(FilterExpression=Attr("email").eq(customer_email)).get(
-        "Items", None
-    )[0]
+    if not user_data:
+        logger.error(f"Could not find a member for Stripe session {session.get('id')}")
+        return
 
-    member_id = response.get("id")
+    member_id = user_data.get("id")
 
     # Set PAID.
-    table.update_item(
-        Key={"id": member_id},
-        UpdateExpression="SET did_pay_dues = :val",
-        ExpressionAttributeValues={":val": True},
-    )
+    await members.update(member_id, {"did_pay_dues": True})
 
     # Do checks to approve membership status.
-    Approve.approve_member(member_id)
+    await Approve.approve_member(member_id)
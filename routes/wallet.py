@@ -3,14 +3,14 @@ import os
 import uuid
 from typing import Optional
 
-import boto3
-import requests
 from airpress import PKPass
 from fastapi import APIRouter, Cookie, Request, Response
 
 from models.info import InfoModel
 from models.user import PublicContact
+from util.aio import http, run_sync
 from util.authentication import Authentication
+from util.database import members
 from util.errors import Errors
 from util.options import Options
 
@@ -26,21 +26,22 @@ Used to get Discord image.
 """
 
 
-def get_img(url):
-    resp = requests.get(url, stream=True)
+async def get_img(url):
+    resp = await http.get(url)
     status = resp.status_code
     if status < 400:
-        return resp.raw.read()
+        return resp.content
     else:
-        return get_img("https://cdn.hackucf.org/PFP.png")
+        return await get_img("https://cdn.hackucf.org/PFP.png")
 
 
 """
 User data -> Apple Wallet blob
+The profile image is fetched beforehand, since this runs on a worker thread.
 """
 
 
-def apple_wallet(user_data):
+def apple_wallet(user_data, img_data=None):
     # Create empty pass package
     p = PKPass()
 
@@ -125,16 +126,9 @@ def apple_wallet(user_data):
         },
     }
 
-    # I am duplicating the file reads because it's easier than re-setting file pointers to the start of each file.
-    # I think.
-
     # User profile image
-    discord_img = user_data.get("discord", {}).get("avatar", False)
-    if discord_img:
-        img_data = get_img(discord_img)
+    if img_data:
         p.add_to_pass_package(("thumbnail.png", img_data))
-
-        img_data = get_img(discord_img)
         p.add_to_pass_package(("thumbnail@2x.png", img_data))
 
     # Role-based logo.
@@ -239,13 +233,28 @@ async def aapl_gen(
     token: Optional[str] = Cookie(None),
     user_jwt: Optional[object] = {},
 ):
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
-
     # Get data from DynamoDB
-    user_data = table.get_item(Key={"id": user_jwt.get("id")}).get("Item", None)
+    user_data = await members.get(
+        user_jwt.get("id"),
+        attributes=[
+            "id",
+            "first_name",
+            "surname",
+            "infra_email",
+            "ops_email",
+            "discord.username",
+            "discord.avatar",
+        ],
+    )
+
+    # User profile image
+    img_data = None
+    discord_img = user_data.get("discord", {}).get("avatar", False)
+    if discord_img:
+        img_data = await get_img(discord_img)
 
-    p = apple_wallet(user_data)
+    # Reading assets and signing the pass block, so do it on a worker thread.
+    p = await run_sync(apple_wallet, user_data, img_data)
 
     return Response(
         content=bytes(p),
@@ -18,61 +18,120 @@ function load() {
 
     const options = {
         valueNames: valueNames,
-        item: valueItems,
-        searchColumns: ["name", "nid", "discord", "email", "major", "status"]
+        item: valueItems
     };
 
-    let members = [];
-    let count_full_member = 0;
-    let count_all = 0;
+    userList = new List('users', options, []);
 
-    fetch("/admin/list").then(data => {
+    // Searching happens server-side, so the roster never has to be downloaded whole.
+    let debounce;
+    document.querySelector(".member-search").oninput = (evt) => {
+        clearTimeout(debounce);
+        debounce = setTimeout(refreshMembers, 150);
+    };
+
+    document.getElementById("loadMore").onclick = (evt) => {
+        loadPage(false);
+    };
+
+    refreshMembers();
+}
+
+const pageSize = 50;
+let listFilters = {};
+let nextCursor = null;
+let requestSeq = 0;
+
+// Shows the first page of the roster, or search results if there is a query.
+function refreshMembers() {
+    const query = document.querySelector(".member-search").value.trim();
+    if (query)
+        searchMembers(query);
+    else
+        loadPage(true);
+}
+
+function showMembers(members, reset, total) {
+    if (reset)
+        userList.clear();
+    userList.add(members.map(memberEntry));
+
+    document.getElementById("loadMore").style.display = nextCursor ? "inline-block" : "none";
+    document.getElementById("memberTotal").innerText = `${total} total`;
+}
+
+function loadPage(reset) {
+    const seq = ++requestSeq;
+
+    let params = new URLSearchParams({"limit": pageSize, "sort": "join_date", ...listFilters});
+    if (!reset && nextCursor)
+        params.set("cursor", nextCursor);
+
+    fetch("/admin/list?" + params).then(data => {
         return data.json();
     }).then(data2 => {
-        data2 = data2.data;
-        for (let i = 0; i < data2.length; i++) {
-            member = data2[i];
-
-            let userStatus = userStatusString(member);
-            let userEntry = {
-                "id": sanitizeHTML(member.id).replaceAll("&#45;", "-"),
-                "name": sanitizeHTML(member.first_name + " " + member.surname),
-                "status": userStatus,
-                "voting_status": Boolean(member.can_vote),
-                "discord": "@" + sanitizeHTML(member.discord.username),
-                "email": sanitizeHTML(member.email),
-                "nid": sanitizeHTML(member.nid),
-                "experience": sanitizeHTML(member.experience),
-                "major": sanitizeHTML(member.major),
-                "details": `<button class="searchbtn btn" onclick="showUser('${sickoModeSanitize(member.id)}')">Details</a>`,
-                "is_full_member": Boolean(member.is_full_member),
-                "mentee": (member.mentee && member.mentee.domain_interest) ? member.mentee.domain_interest : "Not Mentee"
-            }
-
-            count_all++;
-            if (member.is_full_member)
-                count_full_member++;
-
-            members.push(userEntry);
-
-            member.name = member.first_name + " " + member.surname;
-            member.username = "@" + member.discord.username;
-            member.pfp = member.discord.avatar;
-            member.status = userStatus;
-            userDict[sickoModeSanitize(member.id)] = member;
-        }
+        // Drop responses that were overtaken by a newer request.
+        if (seq !== requestSeq)
+            return;
+
+        nextCursor = data2.next;
+        showMembers(data2.data, reset, data2.total);
+    })
+}
+
+function searchMembers(query) {
+    const seq = ++requestSeq;
 
-        userList = new List('users', options, members);
+    fetch("/admin/search?q=" + encodeURIComponent(query)).then(data => {
+        return data.json();
+    }).then(data2 => {
+        if (seq !== requestSeq)
+            return;
+
+        // Search results aren't paged; apply the status filter here instead.
+        let members = data2.data.filter(member => Object.entries(listFilters).every(
+            ([key, value]) => Boolean(member[key]) === value
+        ));
 
-        document.querySelector(".right").innerHTML += `<br>${count_full_member} dues-paying, ${count_all} total`;
+        nextCursor = null;
+        showMembers(members, true, data2.total);
     })
 }
 
+function memberEntry(member) {
+    member.discord = member.discord || {};
+
+    let userStatus = userStatusString(member);
+    let userEntry = {
+        "id": sanitizeHTML(member.id).replaceAll("&#45;", "-"),
+        "name": sanitizeHTML(member.first_name + " " + member.surname),
+        "status": userStatus,
+        "voting_status": Boolean(member.can_vote),
+        "discord": "@" + sanitizeHTML(member.discord.username),
+        "email": sanitizeHTML(member.email),
+        "nid": sanitizeHTML(member.nid),
+        "experience": sanitizeHTML(member.experience),
+        "major": sanitizeHTML(member.major),
+        "details": `<button class="searchbtn btn" onclick="loadUser('${sickoModeSanitize(member.id)}')">Details</a>`,
+        "is_full_member": Boolean(member.is_full_member),
+        "mentee": (member.mentee && member.mentee.domain_interest) ? member.mentee.domain_interest : "Not Mentee"
+    }
+
+    member.name = member.first_name + " " + member.surname;
+    member.username = "@" + member.discord.username;
+    member.pfp = member.discord.avatar;
+    member.status = userStatus;
+    userDict[sickoModeSanitize(member.id)] = member;
+
+    return userEntry;
+}
+
 function userStatusString(member) {
     if (member.sudo)
         return "Administrator";
 
-    if (member.cyberlab_monitor.signtime !== 0)
+    // Projected records leave out maps the member never filled in.
+    if (member.cyberlab_monitor && member.cyberlab_monitor.signtime !== 0)
         return "CyberLab Monitor";
 
     if (member.ops_email)
@@ -84,7 +143,7 @@ function userStatusString(member) {
     if (!member.did_pay_dues)
         return "Needs Dues Payment";
 
-    if (!member.ethics_form.signtime !== 0)
+    if (!(member.ethics_form || {}).signtime !== 0)
         return "Needs Ethics Form";
 
     return "Attendee"; // Unactivated account
@@ -134,6 +193,23 @@ function showQR() {
     document.getElementById("scanner").style.display = "block";
 }
 
+// Fetches a member's full record, then shows it.
+function loadUser(userId) {
+    fetch("/admin/get?member_id=" + userId).then(data => {
+        return data.json();
+    }).then(data2 => {
+        let member = data2.data;
+
+        member.name = member.first_name + " " + member.surname;
+        member.username = "@" + member.discord.username;
+        member.pfp = member.discord.avatar;
+        member.status = userStatusString(member);
+
+        userDict[userId] = member;
+        showUser(userId);
+    })
+}
+
 function showUser(userId) {
     const user = userDict[userId]
 
@@ -247,6 +323,12 @@ function showUser(userId) {
 }
 
 function editUser(payload) {
+    const user_id = payload.id;
+
+    // Reject the edit if someone else changed this member since we loaded them.
+    if (userDict[user_id] && typeof userDict[user_id].version !== "undefined")
+        payload.version = userDict[user_id].version;
+
     const options = {
         method: "POST",
         body: JSON.stringify(payload),
@@ -254,8 +336,12 @@ function editUser(payload) {
             "Content-Type": "application/json"
         }
     }
-    const user_id = payload.id;
     fetch("/admin/get", options).then(data => {
+        if (data.status === 409) {
+            alert("This member was changed by someone else. Refreshing their data; please try again.");
+            verifyUser(user_id);
+            return Promise.reject();
+        }
         return data.json();
     }).then(data2 => {
         // Update user data.
@@ -346,19 +432,14 @@ function scannedCode(result) {
     // Enter load mode...
     qrScanner.stop();
 
-    showUser(result.data);
+    loadUser(result.data);
 }
 
 function filter(showOnlyActiveUsers) {
     // showActiveUsers == true -> only active shown
     // showActiveUsers == false -> only inactive shown
-    userList.filter((item) => {
-        let activeOrInactive = item.values().is_full_member;
-        if (!showOnlyActiveUsers) {
-            activeOrInactive = !activeOrInactive
-        }
-        return activeOrInactive;
-    });
+    listFilters.is_full_member = showOnlyActiveUsers;
+    refreshMembers();
 
     document.getElementById("activeFilter").innerText = showOnlyActiveUsers ? "Active" : "Inactive"
     document.getElementById("activeFilter").onclick = (evt) => {
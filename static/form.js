@@ -1,28 +1,198 @@
 // Other dropdown logic
+function bind_other_inputs() {
+    let dropdowns = document.querySelectorAll("select");
+    let checkboxes = document.querySelectorAll("fieldset.checkbox");
+
+    for (let i = 0; i < dropdowns.length; i++) {
+        dropdowns[i].onchange = evt => {
+            let el = evt.target;
+            if (el.value == "_other") {
+                el.parentElement.querySelector(".other_dropdown").style.display = "block";
+            } else {
+                el.parentElement.querySelector(".other_dropdown").style.display = "none";
+            }
+        }
+    }
+
+    for (let i = 0; i < checkboxes.length; i++) {
+        checkboxes[i].onchange = evt => {
+            let el = evt.target;
+            if (el.value == "_other" && el.checked) {
+                el.parentElement.parentElement.querySelector(".other_checkbox").style.display = "block";
+            } else if (el.value == "_other") {
+                el.parentElement.parentElement.querySelector(".other_checkbox").style.display = "none";
+            }
+        }
+    }
+}
 
-let dropdowns = document.querySelectorAll("select");
-let checkboxes = document.querySelectorAll("fieldset.checkbox");
+bind_other_inputs();
 
-for (let i = 0; i < dropdowns.length; i++) {
-    dropdowns[i].onchange = evt => {
-        let el = evt.target;
-        if (el.value == "_other") {
-            el.parentElement.querySelector(".other_dropdown").style.display = "block";
-        } else {
-            el.parentElement.querySelector(".other_dropdown").style.display = "none";
+
+// Client-side Kennelish rendering.
+//
+// Mirrors util/kennelish.py. The form JSON comes from /api/form/{id}/v/{version}, which
+// the browser caches for good, and the member's values from /api/form/{id}/prefill.
+// Form JSON is ours and may hold markup; member values are escaped.
+
+function escape_html(str) {
+    return String(str)
+        .replaceAll("&", "&amp;")
+        .replaceAll("<", "&lt;")
+        .replaceAll(">", "&gt;")
+        .replaceAll("'", "&#39;")
+        .replaceAll('"', "&quot;");
+}
+
+function or_default(value, fallback) {
+    return typeof(value) == "undefined" ? fallback : value;
+}
+
+function kennelish_id(key) {
+    return key.replaceAll(".", "_").replaceAll(" ", "_");
+}
+
+function kennelish_required(entry) {
+    return entry.required ? " required" : " ";
+}
+
+function kennelish_label(entry, inner) {
+    let text = `<h3>${or_default(entry.label, "")}</h3><h4>${or_default(entry.caption, "")}</h4>`;
+    return `<div class='entry'><div>${text}</div><div>${inner}</div></div>`;
+}
+
+// The member's value for an element, or `fallback` if it isn't prefilled.
+function kennelish_value(entry, prefill, fallback) {
+    if (entry.prefill === false)
+        return fallback;
+    return or_default(prefill.values[or_default(entry.key, "")], fallback);
+}
+
+function kennelish_text(entry, prefill, inp_type) {
+    let pattern = " ";
+    if (inp_type == "email" && entry.domain) {
+        pattern = ` pattern="([A-Za-z0-9.-_+]+)@${entry.domain}"`;
+    } else if (inp_type == "email") {
+        pattern = ' pattern="([A-Za-z0-9.-_+]+)@[A-Za-z0-9-]+(.[A-Za-z-]{2,})"';
+    } else if (inp_type == "nid") {
+        pattern = ' pattern="^([a-z]{2}[0-9]{6})$"';
+    }
+
+    let key = or_default(entry.key, "");
+    let value = escape_html(kennelish_value(entry, prefill, ""));
+    let type = inp_type == "nid" ? "text" : inp_type;
+    return kennelish_label(entry, `<input class='kennelish_input'${kennelish_required(entry)}${pattern} name='${key}' type='${type}' value='${value}' placeholder='${or_default(entry.label, "")}' />`);
+}
+
+function kennelish_choices(entry, kind, options, value, prefix) {
+    let key = or_default(entry.key, "");
+    let output = `${prefix}<fieldset name='${key}'${kennelish_required(entry)} class='kennelish_input ${kind}'>`;
+    for (const option of options) {
+        let selected = option === value ? "checked" : "";
+        let id = `radio_${kennelish_id(key)}_${option}`;
+        output += `<div><input type='radio' ${selected} name='${key}' id='${id}' value='${option}'><label for='${id}'>${option}</label></div>`;
+    }
+    output += "</fieldset>";
+    return kennelish_label(entry, output);
+}
+
+function kennelish_checkbox(entry) {
+    let key = or_default(entry.key, "");
+    let output = `<fieldset name='${key}'${kennelish_required(entry)} class='kennelish_input checkbox'>`;
+    for (const option of entry.options) {
+        let id = `checkbox_${kennelish_id(key)}_${option}`;
+        output += `<div><input type='checkbox' name='${key}' id='${id}' value='${option}'><label for='${id}'>${option}</label></div>`;
+    }
+    output += `<div><input type='checkbox' name='${key}' id='checkbox_${kennelish_id(key)}_OTHER' value='_other'><label for='checkbox_${kennelish_id(key)}_OTHER'>Other</label></div>`;
+    output += `<input id='${kennelish_id(key)}' class='other_checkbox' type='text' placeholder='${or_default(entry.label, "Other")}...'>`;
+    output += "</fieldset>";
+    return kennelish_label(entry, output);
+}
+
+function kennelish_dropdown(entry, prefill) {
+    let key = or_default(entry.key, "");
+    let value = kennelish_value(entry, prefill, "_default");
+    let output = `<select class='kennelish_input'${kennelish_required(entry)} name='${key}'><option disabled ${value === "_default" ? "selected " : ""}value='_default'>Select...</option>`;
+    for (const option of entry.options) {
+        output += `<option ${value === option ? "selected " : ""}value='${option}'>${option}</option>`;
+    }
+
+    if (entry.other) {
+        output += `<option value='_other'>Other</option></select><input id='${kennelish_id(key)}' class='other_dropdown' type='text' placeholder='${or_default(entry.label, "Other")}...'>`;
+    } else {
+        output += "</select>";
+    }
+    return kennelish_label(entry, output);
+}
+
+function kennelish_navigation(entry) {
+    let back = "";
+    if (entry.prev) {
+        back = `<button type='button' class='btn wide grey' onclick='submit_and_nav("${entry.prev}")'>${or_default(entry.prev_label, "Back")}</button>`;
+    }
+    let forward = `<button type='button' class='btn wide' onclick='submit_and_nav("${or_default(entry.next, "#")}")'>${or_default(entry.next_label, "Next")}</button>`;
+    return `<div class='entry'><div>${back}</div><div>${forward}</div></div>`;
+}
+
+function kennelish_entry(entry, prefill) {
+    switch (entry.input) {
+        case "h1":
+        case "h2":
+        case "h3":
+        case "p":
+            return `<${entry.input}>${or_default(entry.label, "")}</${entry.input}>` + render_kennelish(or_default(entry.elements, []), prefill);
+        case "email":
+        case "nid":
+        case "text":
+            return kennelish_text(entry, prefill, entry.input);
+        case "radio":
+            return kennelish_choices(entry, "radio", entry.options, kennelish_value(entry, prefill, ""), "");
+        case "checkbox":
+            return kennelish_checkbox(entry);
+        case "dropdown":
+            return kennelish_dropdown(entry, prefill);
+        case "slider": {
+            let captions = `<span class='caption'>${or_default(entry.novice_label, "Novice")}</span><span class='right caption'>${or_default(entry.expert_label, "Expert")}</span><br>`;
+            return kennelish_choices(entry, "radio gridded", [1, 2, 3, 4, 5], kennelish_value(entry, prefill, ""), captions);
         }
+        case "signature":
+            return `<div name='${entry.key}' class='signature'>By submitting this form, you, ${escape_html(prefill.signature)}, agree to the above terms. This form will be time-stamped.</div>`;
+        case "navigation":
+            return kennelish_navigation(entry);
+        default:
+            return `<h3 class='invalid'>Invalid Input: ${entry.input}</h3>`;
     }
 }
 
-for (let i = 0; i < checkboxes.length; i++) {
-    checkboxes[i].onchange = evt => {
-        let el = evt.target;
-        if (el.value == "_other" && el.checked) {
-            el.parentElement.parentElement.querySelector(".other_checkbox").style.display = "block";
-        } else if (el.value == "_other") {
-            el.parentElement.parentElement.querySelector(".other_checkbox").style.display = "none";
+function render_kennelish(body, prefill) {
+    let output = "";
+    for (const entry of body) {
+        try {
+            output += kennelish_entry(entry, prefill);
+        } catch (e) {
+            console.error(e);
+            output += "<h3 class='invalid'>Invalid Input: Malformed object</h3>";
         }
     }
+    return output;
+}
+
+function load_form(el) {
+    const form_id = el.dataset.form;
+
+    Promise.all([
+        fetch(`/api/form/${form_id}/v/${el.dataset.version}`).then(resp => resp.json()),
+        fetch(`/api/form/${form_id}/prefill`, {credentials: "same-origin"}).then(resp => resp.json()),
+    ]).then(([body, prefill]) => {
+        el.innerHTML = render_kennelish(body, prefill);
+        bind_other_inputs();
+    }).catch(_ => {
+        banner("Could not load this form. Please refresh the page.");
+    })
+}
+
+if (document.querySelector(".form[data-form]")) {
+    load_form(document.querySelector(".form[data-form]"));
 }
 
 
@@ -0,0 +1,44 @@
+"""
+Helpers for doing I/O from async handlers without stalling the event loop.
+
+Sync-only libraries (boto3, smtplib, openstack, Terraform, Stripe) are run on worker
+threads. Each kind of work gets its own bounded pool, so a stalled SMTP server or
+OpenStack API can use up its own threads but never the ones DynamoDB reads need.
+"""
+import functools
+
+import anyio
+import httpx
+
+from util.options import Options
+
+options = Options.fetch()
+
+pool_sizes = {
+    # Fast, latency-sensitive calls (DynamoDB, redis).
+    "database": options.get("threads", {}).get("database", 32),
+    # Slow third-party calls (SMTP, OpenStack, Terraform, Stripe, Discord OAuth).
+    "external": options.get("threads", {}).get("external", 16),
+}
+
+# Limiters have to be created inside the running event loop, so they are made lazily.
+limiters = {}
+
+# Shared async HTTP client for Discord and avatar fetches. Keeps connections alive.
+http = httpx.AsyncClient(
+    timeout=httpx.Timeout(options.get("http", {}).get("timeout", 10)),
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
+
+
+async def run_sync(func, *args, pool="external", **kwargs):
+    """
+    Runs a blocking function on a worker thread from the given pool and awaits it.
+    """
+    if pool not in limiters:
+        limiters[pool] = anyio.CapacityLimiter(pool_sizes[pool])
+
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=limiters[pool]
+    )
@@ -1,10 +1,11 @@
 import logging
 import os
 
-import boto3
 import openstack
 from python_terraform import Terraform
 
+from util.aio import run_sync
+from util.database import members
 from util.discord import Discord
 from util.email import Email
 from util.horsepass import HorsePass
@@ -27,131 +28,158 @@ class Approve:
     def __init__(self):
         pass
 
-    def provision_infra(member_id, user_data=None):
-        # Log into OpenStack
-        conn = openstack.connect(cloud="hackucf_infra")
-
-        try:
-            os.remove("terraform.tfstate")
-        except Exception:
-            pass
-
+    async def provision_infra(member_id, user_data=None):
         try:
-            os.remove("terraform.tfstate.backup")
-        except Exception:
-            pass
-
-        try:
-            dynamodb = boto3.resource("dynamodb")
-            table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
             if not user_data:
-                user_data = table.get_item(Key={"id": member_id}).get("Item", None)
+                user_data = await members.get(member_id)
 
             # See if existing email.
             username = user_data.get("infra_email", False)
-            if username:
-                user = conn.identity.find_user(username)
-                if user:
-                    # Delete user's default project
-                    logger.debug(f"user // {user.default_project_id}")
-                    proj = conn.identity.get_project(user.default_project_id)
-                    proj = conn.identity.delete_project(proj)
-
-                    # Delete user
-                    conn.identity.delete_user(user)
-                    logger.debug(f"{username}: User deleted.")
-                else:
-                    logger.debug(f"{username}: No user.")
-
-            else:
+            existing = bool(username)
+            if not existing:
                 username = (
                     user_data.get("discord", {}).get("username").replace(" ", "_")
                     + "@infra.hackucf.org"
                 )
                 # Add username to Onboard database
-                table.update_item(
-                    Key={"id": member_id},
-                    UpdateExpression="SET infra_email = :val",
-                    ExpressionAttributeValues={":val": username},
-                )
+                await members.update(member_id, {"infra_email": username})
 
             password = HorsePass.gen()
 
-            ###
-            # Let's create a new OpenStack user with the SDK!
-            ###
-
-            # Create a project for the new users
-            try:
-                new_proj = conn.identity.create_project(
-                    name=member_id,
-                    description="Automatically provisioning with Hack@UCF Onboard",
-                )
-            except openstack.exceptions.ConflictException:
-                # This happens sometimes.
-                new_proj = conn.identity.find_project("member_id")
-
-            # Create account and important resources via Terraform magics.
-            new_user = conn.identity.create_user(
-                default_project_id=new_proj.id,
-                name=username,
-                description="Hack@UCF Dues Paying Member",
-                password=password,
-            )
-
-            # Find member role + assign it to user and project
-            member_role = conn.identity.find_role("member")
-            conn.identity.assign_project_role_to_user(
-                project=new_proj, user=new_user, role=member_role
-            )
-
-            # Find admin role + assign it to Onboard user + user project
-            admin_role = conn.identity.find_role("admin")
-            conn.identity.assign_project_role_to_user(
-                project=new_proj,
-                user=conn.identity.find_user("onboard-service"),
-                role=admin_role,
+            # The OpenStack SDK blocks, so it runs on a worker thread.
+            await run_sync(
+                Approve.create_infra_account, member_id, username, password, existing
             )
 
-            ## Push account to OpenStack via Terraform magics (not used rn)
-            # tf_vars = {'os_password': options.get('infra', {}).get('ad', {}).get('password'), 'tenant_name': member_id, 'handle': username, 'password': password}
-            # tf.apply(var=tf_vars, skip_plan=True)
-
             return {"username": username, "password": password}
         except Exception as e:
             logger.exception(e)
             return None
 
-    # !TODO finish the post-sign-up stuff + testing
-    def approve_member(member_id):
-        logger.info(f"Re-running approval for {member_id}")
-        dynamodb = boto3.resource("dynamodb")
-        table = dynamodb.Table(options.get("aws").get("dynamodb").get("table"))
+    def create_infra_account(member_id, username, password, existing=False):
+        # Log into OpenStack
+        conn = openstack.connect(cloud="hackucf_infra")
 
-        user_data = table.get_item(Key={"id": member_id}).get("Item", None)
+        try:
+            os.remove("terraform.tfstate")
+        except Exception:
+            pass
 
-        # If a member was already approved, kill process.
-        if user_data.get("is_full_member", False):
-            logger.info("\tAlready full member.")
-            return True
+        try:
+            os.remove("terraform.tfstate.backup")
+        except Exception:
+            pass
 
+        if existing:
+            user = conn.identity.find_user(username)
+            if user:
+                # Delete user's default project
+                logger.debug(f"user // {user.default_project_id}")
+                proj = conn.identity.get_project(user.default_project_id)
+                proj = conn.identity.delete_project(proj)
+
+                # Delete user
+                conn.identity.delete_user(user)
+                logger.debug(f"{username}: User deleted.")
+            else:
+                logger.debug(f"{username}: No user.")
+
+        ###
+        # Let's create a new OpenStack user with the SDK!
+        ###
+
+        # Create a project for the new users
+        try:
+            new_proj = conn.identity.create_project(
+                name=member_id,
+                description="Automatically provisioning with Hack@UCF Onboard",
+            )
+        except openstack.exceptions.ConflictException:
+            # This happens sometimes.
+            new_proj = conn.identity.find_project("member_id")
+
+        # Create account and important resources via Terraform magics.
+        new_user = conn.identity.create_user(
+            default_project_id=new_proj.id,
+            name=username,
+            description="Hack@UCF Dues Paying Member",
+            password=password,
+        )
+
+        # Find member role + assign it to user and project
+        member_role = conn.identity.find_role("member")
+        conn.identity.assign_project_role_to_user(
+            project=new_proj, user=new_user, role=member_role
+        )
+
+        # Find admin role + assign it to Onboard user + user project
+        admin_role = conn.identity.find_role("admin")
+        conn.identity.assign_project_role_to_user(
+            project=new_proj,
+            user=conn.identity.find_user("onboard-service"),
+            role=admin_role,
+        )
+
+        ## Push account to OpenStack via Terraform magics (not used rn)
+        # tf_vars = {'os_password': options.get('infra', {}).get('ad', {}).get('password'), 'tenant_name': member_id, 'handle': username, 'password': password}
+        # tf.apply(var=tf_vars, skip_plan=True)
+
+    def is_eligible(user_data):
         # Sorry for the long if statement. But we consider someone a "member" iff:
         # - They have a name
         # - We have their Discord snowflake
         # - They paid dues
         # - They signed their ethics form
-        if (
+        return bool(
             user_data.get("first_name")
             and user_data.get("discord_id")
             and user_data.get("did_pay_dues")
             and user_data.get("ethics_form", {}).get("signtime", 0) != 0
-        ):
+        )
+
+    async def approve_members(member_ids):
+        """
+        Re-runs approval for many members at once, e.g. from a scanned sign-in sheet.
+
+        Records are fetched in batches and the rule is checked in memory. Only members
+        who are newly eligible go through the full workflow (Infra, Discord, email);
+        everyone else is just reported on.
+        """
+        user_data = await members.batch_get(member_ids)
+
+        result = {"promoted": [], "already": [], "incomplete": [], "missing": []}
+        for member_id in dict.fromkeys(member_ids):
+            data = user_data.get(member_id)
+            if data is None:
+                result["missing"].append(member_id)
+            elif data.get("is_full_member", False):
+                result["already"].append(member_id)
+            elif Approve.is_eligible(data):
+                await Approve.approve_member(member_id, user_data=data)
+                result["promoted"].append(member_id)
+            else:
+                result["incomplete"].append(member_id)
+
+        return result
+
+    # !TODO finish the post-sign-up stuff + testing
+    async def approve_member(member_id, user_data=None):
+        logger.info(f"Re-running approval for {member_id}")
+        if not user_data:
+            user_data = await members.get(member_id)
+
+        # If a member was already approved, kill process.
+        if user_data.get("is_full_member", False):
+            logger.info("\tAlready full member.")
+            return True
+
+        if Approve.is_eligible(user_data):
             logger.info("\tNewly-promoted full member!")
 
             discord_id = user_data.get("discord_id")
 
             # Create an Infra account.
-            creds = Approve.provision_infra(
+            creds = await Approve.provision_infra(
                 member_id, user_data=user_data
             )  # TODO(err): sometimes this is None
             if creds is None:
@@ -163,7 +191,7 @@ class Approve:
                 # <whitelist logic>
 
             # Assign the Dues-Paying Member role
-            Discord.assign_role(
+            await Discord.assign_role(
                 discord_id, options.get("discord", {}).get("member_role")
             )
 
@@ -187,14 +215,12 @@ Happy Hacking,
   - Hack@UCF Bot
             """
 
-            Discord.send_message(discord_id, welcome_msg)
-            Email.send_email("Welcome to Hack@UCF", welcome_msg, user_data.get("email"))
-            # Set member as a "full" member.
-            table.update_item(
-                Key={"id": member_id},
-                UpdateExpression="SET is_full_member = :val",
-                ExpressionAttributeValues={":val": True},
+            await Discord.send_message(discord_id, welcome_msg)
+            await Email.send_email(
+                "Welcome to Hack@UCF", welcome_msg, user_data.get("email")
             )
+            # Set member as a "full" member.
+            await members.update(member_id, {"is_full_member": True})
 
         elif user_data.get("did_pay_dues"):
             logger.info("\tPaid dues but did not do other step!")
@@ -214,7 +240,7 @@ If you think you have completed all of these, please reach out to an Exec on the
 We hope to see you soon,
   - Hack@UCF Bot
 """
-            Discord.send_message(discord_id, fail_msg)
+            await Discord.send_message(user_data.get("discord_id"), fail_msg)
 
         else:
             logger.info("\tDid not pay dues yet.")
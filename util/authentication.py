@@ -1,18 +1,104 @@
+import threading
 import time
 from functools import wraps
 from typing import Optional
 
-from fastapi import Request, status
+from cachetools import LRUCache
+from fastapi import Cookie, Request, status
 from fastapi.responses import RedirectResponse
 from jose import jwt
 
 # Import options and errors
+from util.aio import run_sync
 from util.errors import Errors
-from util.options import Options
+from util.options import Options, settings_file
+from util.revocation import revocations
+from util.sessions import sessions
 
 options = Options.fetch()
 
 
+class TokenCache:
+    """
+    Bounded LRU of token -> verified claims, so a token's signature is checked once per
+    worker rather than on every request.
+
+    Only the signature check is cached. Lifetimes (including the shorter sudo lifetime)
+    depend on the current time and are checked by the caller on every request; tokens
+    carrying an `exp` claim are dropped from the cache once it passes.
+    """
+
+    def __init__(self, size: int = 4096):
+        self.tokens = LRUCache(maxsize=size)
+        self.lock = threading.Lock()
+
+    def decode(self, token: str) -> dict:
+        """
+        Returns a copy of the token's claims. Raises if it isn't valid.
+        """
+        with self.lock:
+            claims = self.tokens.get(token)
+
+        if claims is not None and time.time() >= claims.get("exp", float("inf")):
+            with self.lock:
+                self.tokens.pop(token, None)
+            claims = None
+
+        if claims is None:
+            claims = jwt.decode(
+                token, options.jwt.secret, algorithms=options.jwt.algorithm
+            )
+            with self.lock:
+                self.tokens[token] = claims
+
+        return dict(claims)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+tokens = TokenCache(options.jwt.cache_size)
+
+# Claims verified with an old secret must not outlive a reload that rotates it.
+settings_file().on_reload(lambda settings: tokens.clear())
+
+
+async def get_claims(
+    request: Request, token: Optional[str] = Cookie(None)
+) -> Optional[dict]:
+    """
+    FastAPI dependency giving the claims of the request's token, or None if there is no
+    valid token. Lifetimes are not checked; use the decorators for that.
+
+    The token is normally a session id (see util.sessions); JWTs issued before sessions
+    existed are still accepted unless revoked (see util.revocation). The result is kept
+    on the request, so the decorators and any Depends(get_claims) in the same request
+    share one lookup.
+    """
+    if not hasattr(request.state, "claims"):
+        if not token:
+            request.state.claims = None
+        elif sessions.is_session_id(token):
+            request.state.claims = await run_sync(sessions.get, token, pool="database")
+        else:
+            try:
+                request.state.claims = tokens.decode(token)
+            except Exception:
+                # Whatever a malformed token makes jose raise, treat it as logged out.
+                request.state.claims = None
+
+            # Only tokens the Bloom filter can't rule out cost a trip to Redis.
+            if (
+                request.state.claims is not None
+                and revocations.might_be_revoked(token)
+                and await run_sync(revocations.is_revoked, token, pool="database")
+            ):
+                request.state.claims = None
+
+    return request.state.claims
+
+
 class Authentication:
     def __init__(self):
         super(Authentication, self).__init__
@@ -27,15 +113,8 @@ class Authentication:
                     status_code=status.HTTP_302_FOUND,
                 )
 
-            try:
-                user_jwt = jwt.decode(
-                    token,
-                    options.get("jwt").get("secret"),
-                    algorithms=options.get("jwt").get("algorithm"),
-                )
-                is_admin: bool = user_jwt.get("sudo", False)
-                creation_date: float = user_jwt.get("issued", -1)
-            except Exception:
+            user_jwt = await get_claims(request, token)
+            if user_jwt is None:
                 tr = Errors.generate(
                     request,
                     403,
@@ -44,6 +123,9 @@ class Authentication:
                 tr.delete_cookie(key="token")
                 return tr
 
+            is_admin: bool = user_jwt.get("sudo", False)
+            creation_date: float = user_jwt.get("issued", -1)
+
             if not is_admin:
                 return Errors.generate(
                     request,
@@ -52,9 +134,7 @@ class Authentication:
                     essay="If you think this is an error, please try logging in again.",
                 )
 
-            if time.time() > creation_date + options.get("jwt").get("lifetime").get(
-                "sudo"
-            ):
+            if time.time() > creation_date + options.jwt.lifetime.sudo:
                 return Errors.generate(
                     request,
                     403,
@@ -83,14 +163,8 @@ class Authentication:
                     status_code=status.HTTP_302_FOUND,
                 )
 
-            try:
-                user_jwt = jwt.decode(
-                    token,
-                    options.get("jwt").get("secret"),
-                    algorithms=options.get("jwt").get("algorithm"),
-                )
-                creation_date: float = user_jwt.get("issued", -1)
-            except Exception:
+            user_jwt = await get_claims(request, token)
+            if user_jwt is None:
                 tr = Errors.generate(
                     request,
                     403,
@@ -99,9 +173,9 @@ class Authentication:
                 tr.delete_cookie(key="token")
                 return tr
 
-            if time.time() > creation_date + options.get("jwt").get("lifetime").get(
-                "user"
-            ):
+            creation_date: float = user_jwt.get("issued", -1)
+
+            if time.time() > creation_date + options.jwt.lifetime.user:
                 return Errors.generate(
                     request,
                     403,
@@ -0,0 +1,135 @@
+import copy
+import logging
+import threading
+
+import orjson
+import redis
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def typed(item: dict) -> dict:
+    """
+    A member as JSON-safe DynamoDB-typed attributes, so that sets and numbers come
+    back exactly as util.database returns them. This (not pickle) is how members are
+    shared through Redis; anyone who can write to Redis must not be able to run code
+    in the workers.
+    """
+    # Imported here: util.database builds the MemberCache.
+    from util.database import to_dynamo
+
+    return {k: to_dynamo(v) for k, v in item.items()}
+
+
+def untyped(attributes: dict) -> dict:
+    from util.database import from_dynamo
+
+    return {k: from_dynamo(v) for k, v in attributes.items()}
+
+
+def encode(item: dict) -> bytes:
+    return orjson.dumps(typed(item))
+
+
+def decode(blob: bytes) -> dict:
+    return untyped(orjson.loads(blob))
+
+
+class MemberCache:
+    """
+    Read-through cache for member records, keyed by member ID.
+
+    The first tier is an in-process LRU with a short TTL. The optional second tier is
+    Redis, which is shared by every worker. Records are copied on the way in and out,
+    so callers can mutate what they get back without corrupting the cache.
+    """
+
+    def __init__(
+        self,
+        size: int = 2048,
+        ttl: int = 30,
+        redis_host: str = None,
+        redis_port: int = 6379,
+        redis_db: int = 0,
+    ):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=size, ttl=ttl)
+        self.lock = threading.Lock()
+
+        # Bumped on every invalidation. A read that started before a write must not
+        # put its (now stale) result back into the cache.
+        self.generation = 0
+
+        self.redis = None
+        if redis_host:
+            self.redis = redis.Redis(
+                connection_pool=redis.ConnectionPool(
+                    host=redis_host, port=redis_port, db=redis_db
+                )
+            )
+
+    def key(self, member_id: str) -> str:
+        return f"member:{member_id}"
+
+    def get_local(self, member_id: str):
+        """
+        Checks only the in-process tier. Never does I/O.
+        """
+        with self.lock:
+            item = self.local.get(member_id)
+        return copy.deepcopy(item) if item is not None else None
+
+    def get(self, member_id: str):
+        item = self.get_local(member_id)
+        if item is not None:
+            return item
+
+        if self.redis is None:
+            return None
+
+        try:
+            blob = self.redis.get(self.key(member_id))
+        except redis.RedisError as e:
+            logger.warning(f"Member cache read failed: {e}")
+            return None
+
+        if blob is None:
+            return None
+
+        try:
+            item = decode(blob)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring malformed member cache entry: {e}")
+            return None
+
+        with self.lock:
+            self.local[member_id] = item
+        return copy.deepcopy(item)
+
+    def set(self, member_id: str, item: dict, generation: int = None):
+        item = copy.deepcopy(item)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.local[member_id] = item
+
+        if self.redis is not None:
+            try:
+                self.redis.set(self.key(member_id), encode(item), ex=self.ttl)
+            except (redis.RedisError, TypeError) as e:
+                logger.warning(f"Member cache write failed: {e}")
+
+    def invalidate(self, member_id: str, shared: bool = True):
+        """
+        Drops a member from the cache. Pass shared=False to leave the Redis tier alone.
+        """
+        with self.lock:
+            self.generation += 1
+            self.local.pop(member_id, None)
+
+        if shared and self.redis is not None:
+            try:
+                self.redis.delete(self.key(member_id))
+            except redis.RedisError as e:
+                logger.warning(f"Member cache invalidation failed: {e}")
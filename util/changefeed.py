@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+import uuid
+
+import orjson
+import redis
+
+from util.cache import typed, untyped
+from util.options import Options
+
+logger = logging.getLogger(__name__)
+
+options = Options.fetch()
+
+
+def encode_event(event: dict) -> bytes:
+    """
+    Serializes an event for other workers. Member records go through the member
+    cache's typed encoding; nothing on this channel is ever unpickled.
+    """
+    return orjson.dumps(
+        {
+            "seq": event["seq"],
+            "origin": event["origin"],
+            "time": event["time"],
+            "member_id": event["member_id"],
+            "old": typed(event["old"]) if event["old"] is not None else None,
+            "new": typed(event["new"]) if event["new"] is not None else None,
+        }
+    )
+
+
+def decode_event(blob: bytes) -> dict:
+    raw = orjson.loads(blob)
+    return {
+        "seq": int(raw["seq"]),
+        "origin": str(raw["origin"]),
+        "local": False,
+        "time": float(raw["time"]),
+        "member_id": str(raw["member_id"]),
+        "old": untyped(raw["old"]) if raw["old"] is not None else None,
+        "new": untyped(raw["new"]) if raw["new"] is not None else None,
+    }
+
+
+class ChangeFeed:
+    """
+    Ordered stream of member record changes.
+
+    Every write made through the member repository is published here as an event:
+
+        {"seq": 12, "origin": "<worker id>", "local": True, "time": 1700000000.0,
+         "member_id": "...", "old": {...} or None, "new": {...}}
+
+    Subscribers (the member cache, the roster index, stats counters, ...) are called
+    synchronously on the writing thread, in `seq` order, before the write returns. With
+    Redis enabled, events are also sent to the other workers over pub/sub and delivered
+    to their subscribers with "local": False, so every worker's in-memory views follow
+    every write without re-reading DynamoDB.
+    """
+
+    def __init__(
+        self,
+        redis_host: str = None,
+        redis_port: int = 6379,
+        redis_db: int = 0,
+        channel: str = "onboard:members",
+    ):
+        self.origin = uuid.uuid4().hex
+        self.channel = channel
+        self.subscribers = []
+
+        # Held while an event is numbered and dispatched, so subscribers see one event
+        # at a time and in order.
+        self.lock = threading.RLock()
+        self.seq = 0
+
+        # Last sequence number seen from each other worker, to notice dropped events.
+        self.seen = {}
+
+        self.redis = None
+        if redis_host:
+            self.redis = redis.Redis(
+                connection_pool=redis.ConnectionPool(
+                    host=redis_host, port=redis_port, db=redis_db
+                )
+            )
+        self.pubsub = None
+        self.thread = None
+
+    def subscribe(self, subscriber):
+        """
+        Registers `subscriber(event)`. Subscribers must be quick and thread-safe;
+        exceptions are logged and do not affect the write or other subscribers.
+        """
+        self.subscribers.append(subscriber)
+
+    def dispatch(self, event: dict):
+        for subscriber in self.subscribers:
+            try:
+                subscriber(event)
+            except Exception as e:
+                logger.exception(e)
+
+    def publish(self, old, new) -> dict:
+        """
+        Records that a member went from `old` (None if it didn't exist) to `new`.
+        """
+        with self.lock:
+            self.seq += 1
+            event = {
+                "seq": self.seq,
+                "origin": self.origin,
+                "local": True,
+                "time": time.time(),
+                "member_id": (new or old)["id"],
+                "old": old,
+                "new": new,
+            }
+            self.dispatch(event)
+
+            if self.redis is not None:
+                try:
+                    self.redis.publish(self.channel, encode_event(event))
+                except (redis.RedisError, TypeError) as e:
+                    logger.warning(f"Change feed publish failed: {e}")
+
+        return event
+
+    def receive(self, event: dict):
+        if event["origin"] == self.origin:
+            return
+
+        last = self.seen.get(event["origin"])
+        if last is not None and event["seq"] != last + 1:
+            missed = event["seq"] - last - 1
+            logger.warning(f"Change feed missed {missed} event(s) from another worker.")
+        self.seen[event["origin"]] = event["seq"]
+
+        with self.lock:
+            self.dispatch(event)
+
+    def listen(self):
+        while self.pubsub is not None:
+            try:
+                self.pubsub.subscribe(self.channel)
+                for message in self.pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        event = decode_event(message["data"])
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        logger.warning(f"Ignoring malformed change feed event: {e}")
+                        continue
+                    self.receive(event)
+            except Exception as e:
+                if self.pubsub is None:
+                    return
+                logger.warning(f"Change feed subscription failed: {e}")
+                time.sleep(1)
+
+    def start(self):
+        """
+        Starts receiving other workers' events, if Redis is enabled.
+        """
+        if self.redis is None or self.thread is not None:
+            return
+
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.thread = threading.Thread(
+            target=self.listen, name="changefeed", daemon=True
+        )
+        self.thread.start()
+
+    def close(self):
+        pubsub, self.pubsub = self.pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+        self.thread = None
+
+
+changes = ChangeFeed(
+    redis_host=options.get("redis").get("host")
+    if options.get("changefeed", {}).get("redis", False)
+    else None,
+    redis_port=options.get("redis").get("port"),
+    redis_db=options.get("redis").get("db"),
+    channel=options.get("changefeed", {}).get("channel", "onboard:members"),
+)
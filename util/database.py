@@ -0,0 +1,561 @@
+import asyncio
+import copy
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import Binary, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from models.user import UserModel
+from util.aio import run_sync
+from util.cache import MemberCache
+from util.changefeed import ChangeFeed, changes
+from util.options import Options
+
+logger = logging.getLogger(__name__)
+
+options = Options.fetch()
+
+
+def attribute_path(path: str, names: dict) -> str:
+    """
+    Turns a dotted attribute path into placeholders, registering them in `names`, so that
+    reserved words and nested maps are safe to use in expressions.
+    """
+    parts = []
+    for part in path.split("."):
+        placeholder = f"#n{len(names)}"
+        names[placeholder] = part
+        parts.append(placeholder)
+
+    return ".".join(parts)
+
+
+def apply_fields(item: dict, fields: dict) -> dict:
+    """
+    Returns a copy of `item` with the (possibly dotted) attribute paths in `fields` set,
+    mirroring what a SET update does in DynamoDB.
+    """
+    item = copy.deepcopy(item)
+    for path, value in fields.items():
+        *parents, last = path.split(".")
+        target = item
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[last] = copy.deepcopy(value)
+
+    return item
+
+
+def project(item: dict, attributes: list) -> dict:
+    """
+    Returns only the given (possibly dotted) attribute paths of `item`, shaped the way a
+    DynamoDB ProjectionExpression would return them.
+    """
+    projected = {}
+    for path in attributes:
+        *parents, last = path.split(".")
+        source = item
+        target = projected
+        for part in parents:
+            source = source.get(part) if isinstance(source, dict) else None
+            if source is None:
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and last in source:
+                target[last] = copy.deepcopy(source[last])
+
+    return projected
+
+
+def number(value: str):
+    """
+    Parses a DynamoDB number into an int, or a float if it has a fractional part.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+# Raw attribute value type -> native Python value. Unlike boto3's TypeDeserializer,
+# numbers come back as int/float rather than Decimal, so they need no conversion later.
+DECODERS = {
+    "S": lambda v: v,
+    "N": number,
+    "BOOL": lambda v: v,
+    "NULL": lambda v: None,
+    "M": lambda v: {k: from_dynamo(x) for k, x in v.items()},
+    "L": lambda v: [from_dynamo(x) for x in v],
+    "SS": set,
+    "NS": lambda v: {number(x) for x in v},
+    "B": Binary,
+    "BS": lambda v: {Binary(x) for x in v},
+}
+
+# Top-level attributes UserModel types as strings, some of which are stored as numbers
+# in older records (e.g. discord_id).
+STRING_FIELDS = {
+    name for name, field in UserModel.__fields__.items() if field.outer_type_ is str
+}
+
+
+def from_dynamo(value: dict):
+    ((kind, raw),) = value.items()
+    return DECODERS[kind](raw)
+
+
+serializer = TypeSerializer()
+
+
+def to_dynamo(value):
+    """
+    Like TypeSerializer.serialize, but also accepts floats.
+    """
+    if isinstance(value, float):
+        return {"N": str(Decimal(repr(value)))}
+    if isinstance(value, dict):
+        return {"M": {k: to_dynamo(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [to_dynamo(v) for v in value]}
+    return serializer.serialize(value)
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a conditional write finds the member was changed by someone else.
+    """
+
+    pass
+
+
+class MemberRepository:
+    """
+    Shared access to the members table in DynamoDB.
+
+    One instance is created when this module is imported and reused by every route, so
+    credentials, endpoints and the HTTP connection pool are resolved once per worker
+    instead of once per request. Low-level botocore clients are thread-safe, which is
+    why this wraps the client rather than a `boto3.resource` Table.
+
+    Single-item operations are coroutines: boto3 is sync-only, so each call runs on the
+    bounded "database" thread pool instead of blocking the event loop. Scans stay
+    synchronous generators and are meant to be iterated off the loop (Starlette does
+    this for streaming responses).
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        max_pool_connections: int = 50,
+        discord_id_index: str = "discord_id-index",
+        email_index: str = "email-index",
+        scan_segments: int = 4,
+        cache: MemberCache = None,
+        feed: ChangeFeed = None,
+    ):
+        self.table_name = table_name
+        self.cache = cache
+        self.feed = feed
+        self.discord_id_index = discord_id_index
+        self.email_index = email_index
+        self.scan_segments = scan_segments
+
+        config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            tcp_keepalive=True,
+        )
+        self.client = boto3.session.Session().client("dynamodb", config=config)
+
+        if self.feed:
+            self.feed.subscribe(self.on_change)
+
+    def on_change(self, event: dict):
+        """
+        Keeps the cache in step with the change feed. Another worker's write already
+        cleared the shared tier, so only our local copy needs dropping.
+        """
+        if self.cache:
+            self.cache.invalidate(event["member_id"], shared=event["local"])
+
+    def serialize(self, item: dict) -> dict:
+        return {k: to_dynamo(v) for k, v in item.items()}
+
+    def deserialize(self, item: dict) -> dict:
+        """
+        Turns a raw DynamoDB item into a UserModel-shaped dict of native Python values.
+        """
+        item = {k: from_dynamo(v) for k, v in item.items()}
+        for k in STRING_FIELDS.intersection(item):
+            if isinstance(item[k], int):
+                item[k] = str(item[k])
+        return item
+
+    def projection(self, attributes: list) -> dict:
+        """
+        Builds the scan/get arguments that fetch only the given (possibly dotted)
+        attributes.
+        """
+        names = {}
+        paths = [attribute_path(attribute, names) for attribute in attributes]
+        return {
+            "ProjectionExpression": ", ".join(paths),
+            "ExpressionAttributeNames": names,
+        }
+
+    async def get(
+        self, member_id: str, consistent: bool = False, attributes: list = None
+    ):
+        """
+        Returns a member by ID, or None if they do not exist.
+
+        Reads go through the member cache unless `consistent` is set, in which case
+        DynamoDB is always asked (and the cache refreshed).
+
+        Pass `attributes` (dotted paths allowed) to get only those fields. They are cut
+        from the cached record when there is one; otherwise only they are fetched.
+        """
+        # Local cache hits are answered without a trip to the thread pool.
+        if self.cache and not consistent:
+            item = self.cache.get_local(member_id)
+            if item is not None:
+                return project(item, attributes) if attributes else item
+
+        return await run_sync(
+            self._get, member_id, consistent, attributes, pool="database"
+        )
+
+    def _get(self, member_id: str, consistent: bool = False, attributes: list = None):
+        if self.cache and not consistent:
+            item = self.cache.get(member_id)
+            if item is not None:
+                return project(item, attributes) if attributes else item
+
+        kwargs = self.projection(attributes) if attributes else {}
+        generation = self.cache.generation if self.cache else None
+        resp = self.client.get_item(
+            TableName=self.table_name,
+            Key=self.serialize({"id": member_id}),
+            ConsistentRead=consistent,
+            **kwargs,
+        )
+        item = resp.get("Item")
+        if not item:
+            return None
+
+        item = self.deserialize(item)
+
+        # Only whole records go in the cache.
+        if self.cache and not attributes:
+            self.cache.set(member_id, item, generation=generation)
+        return item
+
+    async def batch_get(self, member_ids: list, attributes: list = None) -> dict:
+        """
+        Returns {member_id: record} for every given ID that exists. Cached records are
+        used where possible; the rest are fetched with BatchGetItem in chunks of 100,
+        which run concurrently.
+        """
+        found = {}
+        missing = []
+        for member_id in dict.fromkeys(member_ids):
+            item = self.cache.get_local(member_id) if self.cache else None
+            if item is not None:
+                found[member_id] = project(item, attributes) if attributes else item
+            else:
+                missing.append(member_id)
+
+        chunks = [missing[i : i + 100] for i in range(0, len(missing), 100)]
+        for items in await asyncio.gather(
+            *[
+                run_sync(self._batch_get, chunk, attributes, pool="database")
+                for chunk in chunks
+            ]
+        ):
+            found.update({item["id"]: item for item in items})
+
+        return found
+
+    def _batch_get(self, member_ids: list, attributes: list = None) -> list:
+        request = {"Keys": [self.serialize({"id": i}) for i in member_ids]}
+        if attributes:
+            # BatchGetItem needs the key back to tell records apart.
+            request.update(self.projection(list({"id", *attributes})))
+
+        items = []
+        delay = 0.05
+        while request and request.get("Keys"):
+            resp = self.client.batch_get_item(
+                RequestItems={self.table_name: request}
+            )
+            items += [
+                self.deserialize(item)
+                for item in resp.get("Responses", {}).get(self.table_name, [])
+            ]
+
+            # DynamoDB may hand back keys it didn't get to; retry them with backoff.
+            request = resp.get("UnprocessedKeys", {}).get(self.table_name)
+            if request:
+                time.sleep(delay)
+                delay = min(delay * 2, 1)
+
+        return items
+
+    async def put(self, item: dict):
+        """
+        Writes a whole member record, replacing any existing one. Returns the record
+        that was overwritten, or None if the member is new.
+        """
+        return await run_sync(self._put, item, pool="database")
+
+    def _put(self, item: dict):
+        item = {**item, "version": int(item.get("version") or 0) + 1}
+        resp = self.client.put_item(
+            TableName=self.table_name,
+            Item=self.serialize(item),
+            ReturnValues="ALL_OLD",
+        )
+
+        old = self.deserialize(resp.get("Attributes", {})) or None
+        if self.feed:
+            self.feed.publish(old, item)
+        return old
+
+    async def update(
+        self,
+        member_id: str,
+        fields: dict,
+        expected_version: int = None,
+        condition: str = None,
+        condition_values: dict = None,
+    ):
+        """
+        Sets the given attributes on a member and returns the updated record. Keys may be
+        dotted paths ("ethics_form.signtime") into an existing map attribute.
+
+        Every write bumps the member's `version`. If `expected_version` is given, the
+        write only happens if the stored version still matches; otherwise
+        VersionConflict is raised and nothing is changed. `condition` is an extra
+        ConditionExpression that must hold too, with its own `condition_values`
+        (":name" keys, serialized for you).
+        """
+        if not fields:
+            return None
+
+        return await run_sync(
+            self._update,
+            member_id,
+            fields,
+            expected_version,
+            condition,
+            condition_values,
+            pool="database",
+        )
+
+    def _update(
+        self,
+        member_id: str,
+        fields: dict,
+        expected_version: int = None,
+        condition: str = None,
+        condition_values: dict = None,
+    ):
+        names = {}
+        values = {":one": 1}
+        assignments = []
+        for i, (path, value) in enumerate(fields.items()):
+            values[f":v{i}"] = value
+            assignments.append(f"{attribute_path(path, names)} = :v{i}")
+
+        version = attribute_path("version", names)
+        conditions = []
+        if expected_version is not None:
+            if expected_version:
+                conditions.append(f"{version} = :expected")
+                values[":expected"] = expected_version
+            else:
+                conditions.append(f"attribute_not_exists({version})")
+        if condition:
+            conditions.append(f"({condition})")
+            values.update(condition_values or {})
+
+        kwargs = {}
+        if conditions:
+            kwargs["ConditionExpression"] = " AND ".join(conditions)
+
+        try:
+            resp = self.client.update_item(
+                TableName=self.table_name,
+                Key=self.serialize({"id": member_id}),
+                UpdateExpression=f"SET {', '.join(assignments)} ADD {version} :one",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=self.serialize(values),
+                # The old record is enough to work out the new one locally.
+                ReturnValues="ALL_OLD",
+                **kwargs,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise VersionConflict(member_id) from e
+            raise
+
+        # No old record means this write created the member.
+        old = self.deserialize(resp.get("Attributes", {})) or None
+        new = apply_fields(old or {"id": member_id}, fields)
+        new["version"] = int((old or {}).get("version") or 0) + 1
+
+        if self.feed:
+            self.feed.publish(old, new)
+        return new
+
+    async def query(self, index_name: str, key: str, value) -> list:
+        """
+        Returns the members whose `key` equals `value` on a global secondary index.
+        """
+        return await run_sync(self._query, index_name, key, value, pool="database")
+
+    def _query(self, index_name: str, key: str, value) -> list:
+        resp = self.client.query(
+            TableName=self.table_name,
+            IndexName=index_name,
+            KeyConditionExpression="#k = :v",
+            ExpressionAttributeNames={"#k": key},
+            ExpressionAttributeValues=self.serialize({":v": value}),
+        )
+        return [self.deserialize(item) for item in resp.get("Items", [])]
+
+    async def get_by_discord_id(self, discord_id):
+        """
+        Returns the member with a given Discord snowflake, or None. Backed by the
+        `discord_id` global secondary index, so this never scans the table.
+        """
+        items = await self.query(self.discord_id_index, "discord_id", str(discord_id))
+        return items[0] if items else None
+
+    async def get_by_email(self, email: str):
+        """
+        Returns the member with a given preferred email, or None. Backed by the `email`
+        global secondary index, so only the attributes it projects are returned. Emails
+        are not guaranteed unique, so prefer looking members up by ID.
+        """
+        items = await self.query(self.email_index, "email", email)
+        return items[0] if items else None
+
+    def scan_page(self, exclusive_start_key=None, **kwargs):
+        """
+        Returns one page of a table scan as (items, last_evaluated_key). Extra arguments
+        are passed to DynamoDB as-is, except for ExpressionAttributeValues, which are
+        serialized for you.
+        """
+        if "ExpressionAttributeValues" in kwargs:
+            kwargs["ExpressionAttributeValues"] = self.serialize(
+                kwargs["ExpressionAttributeValues"]
+            )
+        if exclusive_start_key:
+            kwargs["ExclusiveStartKey"] = exclusive_start_key
+
+        resp = self.client.scan(TableName=self.table_name, **kwargs)
+        items = [self.deserialize(item) for item in resp.get("Items", [])]
+        return items, resp.get("LastEvaluatedKey")
+
+    def scan(self, **kwargs) -> list:
+        """
+        Returns the first page of a table scan.
+        """
+        items, _ = self.scan_page(**kwargs)
+        return items
+
+    def scan_iter(self, segments: int = None, **kwargs):
+        """
+        Yields every member in the table, following pagination to the end.
+
+        The table is split into `segments` parallel scan segments that are read
+        concurrently on worker threads. Pages are handed over through a small bounded
+        queue, so memory stays flat no matter how big the table is, and items are
+        yielded as soon as any segment returns them (in no particular order).
+        """
+        segments = segments or self.scan_segments
+
+        if segments <= 1:
+            start_key = None
+            while True:
+                items, start_key = self.scan_page(start_key, **kwargs)
+                yield from items
+                if not start_key:
+                    return
+
+        pages = queue.Queue(maxsize=segments * 2)
+        stop = threading.Event()
+        done = object()
+
+        def read_segment(segment):
+            try:
+                start_key = None
+                while not stop.is_set():
+                    items, start_key = self.scan_page(
+                        start_key, Segment=segment, TotalSegments=segments, **kwargs
+                    )
+                    hand_over(items)
+                    if not start_key:
+                        break
+            except Exception as e:
+                hand_over(e)
+            finally:
+                hand_over(done)
+
+        def hand_over(page):
+            # Give up if the consumer went away, rather than blocking forever.
+            while not stop.is_set():
+                try:
+                    pages.put(page, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            for segment in range(segments):
+                pool.submit(read_segment, segment)
+
+            try:
+                remaining = segments
+                while remaining:
+                    page = pages.get()
+                    if page is done:
+                        remaining -= 1
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield from page
+            finally:
+                stop.set()
+
+
+members = MemberRepository(
+    options.get("aws").get("dynamodb").get("table"),
+    max_pool_connections=options.get("aws")
+    .get("dynamodb")
+    .get("max_pool_connections", 50),
+    discord_id_index=options.get("aws")
+    .get("dynamodb")
+    .get("discord_id_index", "discord_id-index"),
+    email_index=options.get("aws").get("dynamodb").get("email_index", "email-index"),
+    scan_segments=options.get("aws").get("dynamodb").get("scan_segments", 4),
+    cache=MemberCache(
+        size=options.get("cache", {}).get("members", {}).get("size", 2048),
+        ttl=options.get("cache", {}).get("members", {}).get("ttl", 30),
+        redis_host=options.get("redis").get("host")
+        if options.get("cache", {}).get("members", {}).get("redis", False)
+        else None,
+        redis_port=options.get("redis").get("port"),
+        redis_db=options.get("redis").get("db"),
+    ),
+    feed=changes,
+)
@@ -1,7 +1,6 @@
 import json
 
-import requests
-
+from util.aio import http
 from util.options import Options
 
 options = Options.fetch()
@@ -21,39 +20,52 @@ class Discord:
     def __init__(self):
         pass
 
-    def assign_role(discord_id, role_id):
+    async def add_member(discord_id, access_token):
+        discord_id = str(discord_id)
+
+        # Uses the user's OAuth token to make them join the guild.
+        put_join_guild = {"access_token": access_token}
+        req = await http.put(
+            f"https://discord.com/api/guilds/{options.get('discord', {}).get('guild_id')}/members/{discord_id}",
+            headers=headers,
+            content=json.dumps(put_join_guild),
+        )
+
+        return req.status_code < 400
+
+    async def assign_role(discord_id, role_id):
         discord_id = str(discord_id)
 
-        req = requests.put(
+        req = await http.put(
             f"https://discord.com/api/guilds/{options.get('discord', {}).get('guild_id')}/members/{discord_id}/roles/{role_id}",
             headers=headers,
         )
 
         return req.status_code < 400
 
-    def get_dm_channel_id(discord_id):
+    async def get_dm_channel_id(discord_id):
         discord_id = str(discord_id)
 
         # Get DM channel ID.
         get_channel_id_body = {"recipient_id": discord_id}
-        req = requests.post(
+        req = await http.post(
             "https://discord.com/api/users/@me/channels",
             headers=headers,
-            data=json.dumps(get_channel_id_body),
+            content=json.dumps(get_channel_id_body),
         )
         resp = req.json()
 
         return resp.get("id", None)
 
-    def send_message(discord_id, message):
+    async def send_message(discord_id, message):
         discord_id = str(discord_id)
-        channel_id = Discord.get_dm_channel_id(discord_id)
+        channel_id = await Discord.get_dm_channel_id(discord_id)
 
         send_message_body = {"content": message}
-        res = requests.post(
+        res = await http.post(
             f"https://discord.com/api/channels/{channel_id}/messages",
             headers=headers,
-            data=json.dumps(send_message_body),
+            content=json.dumps(send_message_body),
         )
 
         # Use res.ok()?
@@ -4,6 +4,7 @@ from email.mime.text import MIMEText
 
 import commonmark
 
+from util.aio import run_sync
 from util.options import Options
 
 options = Options.fetch()
@@ -24,7 +25,7 @@ class Email:
     This function handles sending emails.
     """
 
-    def send_email(subject, body, recipient):
+    async def send_email(subject, body, recipient):
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
         msg["From"] = email
@@ -38,6 +39,11 @@ class Email:
         part2 = MIMEText(html, "html")
         msg.attach(part1)
         msg.attach(part2)
+
+        # smtplib blocks, so talk to the server on a worker thread.
+        await run_sync(Email.deliver, recipient, msg.as_string())
+
+    def deliver(recipient, message):
         with smtplib.SMTP_SSL(smtp_host, 465) as smtp_server:
             smtp_server.login(email, password)
-            smtp_server.sendmail(email, recipient, msg.as_string())
+            smtp_server.sendmail(email, recipient, message)
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from util.kennelish import Kennelish, Transformer
+from util.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Every "input" Kennelish knows how to render.
+INPUTS = {
+    "h1",
+    "h2",
+    "h3",
+    "p",
+    "email",
+    "nid",
+    "text",
+    "radio",
+    "checkbox",
+    "dropdown",
+    "slider",
+    "signature",
+    "navigation",
+}
+
+# Inputs that store a value on the member, and so need a "key".
+KEYED = {"email", "nid", "text", "radio", "checkbox", "dropdown", "slider"}
+
+# Inputs that offer a fixed list of "options".
+OPTIONED = {"radio", "checkbox", "dropdown"}
+
+
+EMPTY_MODEL = Transformer.kennelish_to_pydantic([])
+
+
+class FormError(ValueError):
+    """
+    Raised when a Kennelish file is not a valid form.
+    """
+
+
+def validate(body, path="form"):
+    """
+    Checks the structure of a Kennelish form, raising FormError at the first problem.
+    """
+    if not isinstance(body, list):
+        raise FormError(f"{path}: expected a list of elements")
+
+    for i, entry in enumerate(body):
+        where = f"{path}[{i}]"
+        if not isinstance(entry, dict):
+            raise FormError(f"{where}: expected an object")
+
+        kind = entry.get("input")
+        if kind not in INPUTS:
+            raise FormError(f"{where}: unknown input {kind!r}")
+        if kind in KEYED and not isinstance(entry.get("key"), str):
+            raise FormError(f"{where}: {kind} needs a \"key\"")
+        if kind in OPTIONED and not isinstance(entry.get("options"), list):
+            raise FormError(f"{where}: {kind} needs a list of \"options\"")
+
+        if "elements" in entry:
+            validate(entry["elements"], f"{where}.elements")
+
+
+class Form:
+    """
+    One parsed, validated Kennelish file. `body` is shared; treat it as read-only.
+
+    Everything derived from the body (the compiled template, the pydantic model that
+    validates submissions, the JSON sent to browsers that render forms themselves) is
+    built once by `compile()` and reused for as long as the content hash (`version`)
+    stays the same.
+    """
+
+    def __init__(self, form_id: str, body: list, mtime: float):
+        self.id = form_id
+        self.body = body
+        self.mtime = mtime
+        self.template = None
+        self.model = None
+        self.fields = None
+        self.json = None
+
+        # Changes whenever the form's content does, for caching downstream.
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+    def compile(self):
+        self.template = Kennelish.compile(self.body)
+        self.model = Transformer.kennelish_to_pydantic(self.body)
+        self.fields = Kennelish.prefill_fields(self.body)
+        self.json = dumps(self.body)
+
+
+class FormRegistry:
+    """
+    Every form in forms/, loaded and validated once and then served from memory.
+
+    `watch()` starts a thread that reloads a form when its file changes (and picks up
+    new or deleted files). A file that fails to parse or validate is logged; the last
+    good version of that form keeps being served.
+    """
+
+    def __init__(self, directory: str = "forms"):
+        self.directory = directory
+        self.forms = {}
+        self.listeners = []
+        self.thread = None
+        self.lock = threading.Lock()
+
+        self.refresh()
+
+    def load(self, form_id: str, path: str, mtime: float) -> Form:
+        with open(path, "r") as file:
+            body = json.load(file)
+        validate(body, form_id)
+        return Form(form_id, body, mtime)
+
+    def refresh(self):
+        """
+        Reloads every form whose file changed since it was last loaded.
+        """
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except OSError as e:
+            logger.error(f"Could not list forms: {e}")
+            return
+
+        changed = []
+        with self.lock:
+            seen = set()
+            for name in names:
+                form_id = name[: -len(".json")]
+                path = os.path.join(self.directory, name)
+                seen.add(form_id)
+                try:
+                    mtime = os.stat(path).st_mtime
+                    current = self.forms.get(form_id)
+                    if current and current.mtime == mtime:
+                        continue
+                    form = self.load(form_id, path, mtime)
+                    if current and current.version == form.version:
+                        # Touched but not changed: keep what's already built.
+                        current.mtime = mtime
+                        continue
+                    form.compile()
+                except Exception as e:
+                    logger.error(f"Could not load form {form_id}: {e}")
+                    continue
+
+                changed.append(form)
+                self.forms[form_id] = form
+
+            for form_id in set(self.forms) - seen:
+                logger.info(f"Form {form_id} was removed.")
+                del self.forms[form_id]
+
+        for form in changed:
+            logger.info(f"Loaded form {form.id} (version {form.version}).")
+            for listener in self.listeners:
+                try:
+                    listener(form)
+                except Exception as e:
+                    logger.exception(e)
+
+    def on_change(self, listener):
+        """
+        Registers `listener(form)` to run whenever a form is loaded with new content.
+        """
+        self.listeners.append(listener)
+
+    def get(self, form_id: str):
+        """
+        Returns the Form, or None if there is no such form.
+        """
+        return self.forms.get(form_id)
+
+    def body(self, form_id: str):
+        form = self.forms.get(form_id)
+        return form.body if form else {}
+
+    def render(self, form_id: str, user_data=None) -> str:
+        """
+        Renders a form as HTML for a member, or "" if there is no such form.
+        """
+        form = self.forms.get(form_id)
+        return form.template.render(user_data) if form else ""
+
+    def prefill(self, form_id: str, user_data=None) -> dict:
+        """
+        The member's prefill values for a form rendered in the browser.
+        """
+        form = self.forms.get(form_id)
+        fields = form.fields if form else []
+        return Kennelish.prefill(fields, user_data)
+
+    def model(self, form_id: str):
+        """
+        Returns the pydantic model that validates submissions of a form. A missing form
+        gets a model with no fields, like an empty Kennelish body would.
+        """
+        form = self.forms.get(form_id)
+        return form.model if form else EMPTY_MODEL
+
+    def watch(self, interval: float = 2):
+        if self.thread is not None:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                self.refresh()
+
+        self.thread = threading.Thread(target=poll, name="forms", daemon=True)
+        self.thread.start()
+
+
+forms = FormRegistry()
@@ -13,6 +13,10 @@ class Kennelish:
     It renders JSON as an HTML form. Note that this has NO correlation with Sileo's native
     depiction format, and the similarities were accidential.
 
+    `parse()` walks the JSON on every call. `compile()` does that walk once and returns a
+    Template where only the per-member bits (values, `checked`, `selected`, the name on
+    a signature) are left to fill in; it must render exactly what `parse()` does, which
+    `python3 -m benchmarks.kennelish` checks for every form.
     """
 
     def __init__(self):
@@ -58,9 +62,13 @@ class Kennelish:
         return output
 
     def label(entry, innerHtml):
+        before, after = Kennelish.label_parts(entry)
+        return before + innerHtml + after
+
+    def label_parts(entry):
         text = f"<h3>{entry.get('label', '')}</h3>"
         text += f"<h4>{entry.get('caption', '')}</h4>"
-        return f"<div class='entry'><div>{text}</div><div>{innerHtml}</div></div>"
+        return f"<div class='entry'><div>{text}</div><div>", "</div></div>"
 
     def header(entry, user_data=None, tag="h1"):
         output = f"<{tag}>{entry.get('label', '')}</{tag}>"
@@ -68,9 +76,12 @@ class Kennelish:
         return output
 
     def signature(entry, user_data=None):
-        output = f"<div name='{entry.get('key')}' class='signature'>By submitting this form, you, {user_data.get('first_name', 'HackUCF Member #' + user_data.get('id'))} {user_data.get('surname', '')}, agree to the above terms. This form will be time-stamped.</div>"
+        output = f"<div name='{entry.get('key')}' class='signature'>By submitting this form, you, {Kennelish.signature_name(user_data)}, agree to the above terms. This form will be time-stamped.</div>"
         return output
 
+    def signature_name(user_data):
+        return f"{user_data.get('first_name', 'HackUCF Member #' + user_data.get('id'))} {user_data.get('surname', '')}"
+
     def text(entry, user_data=None, inp_type="text"):
         # Pre-filling of data from database (+ special rule for email discovery)
         if entry.get("prefill", True):
@@ -183,6 +194,249 @@ class Kennelish:
     def invalid(entry):
         return f"<h3 class='invalid'>Invalid Input: {entry['input']}</h3>"
 
+    def compile(obj):
+        """
+        Pre-renders a Kennelish body into a Template. Render it with
+        `template.render(user_data)`.
+        """
+        return Template(Kennelish.compile_parts(obj))
+
+    def compile_parts(obj):
+        parts = []
+        for entry in obj:
+            try:
+                parts.extend(Kennelish.compile_entry(entry))
+            except Exception as e:
+                logger.exception(e)
+                parts.append(MALFORMED)
+        return parts
+
+    def compile_entry(entry):
+        """
+        Returns the parts for one element: static strings, and functions of user_data
+        for anything prefilled.
+        """
+        kind = entry["input"]
+        if kind in ("h1", "h2", "h3", "p"):
+            children = Kennelish.compile_parts(entry.get("elements", []))
+            return [f"<{kind}>{entry.get('label', '')}</{kind}>", *children]
+        if kind in ("email", "nid", "text"):
+            return [Kennelish.compile_text(entry, kind)]
+        if kind == "radio":
+            return [Kennelish.compile_radio(entry)]
+        if kind == "dropdown":
+            return [Kennelish.compile_dropdown(entry)]
+        if kind == "slider":
+            return [Kennelish.compile_slider(entry)]
+        if kind == "signature":
+            return [slot(lambda user_data: Kennelish.signature(entry, user_data))]
+        if kind == "checkbox":
+            return [Kennelish.checkbox(entry)]
+        if kind == "navigation":
+            return [Kennelish.navigation(entry)]
+        return [Kennelish.invalid(entry)]
+
+    def compile_text(entry, inp_type="text"):
+        key = entry.get("key", "")
+
+        regex_pattern = " "
+        if inp_type == "email" and entry.get("domain", False):
+            regex_pattern = ' pattern="([A-Za-z0-9.-_+]+)@' + entry.get("domain") + '"'
+        elif inp_type == "email":
+            regex_pattern = (
+                ' pattern="([A-Za-z0-9.-_+]+)@[A-Za-z0-9-]+(.[A-Za-z-]{2,})"'
+            )
+        elif inp_type == "nid":
+            regex_pattern = ' pattern="^([a-z]{2}[0-9]{6})$"'
+
+        before, after = Kennelish.label_parts(entry)
+        before += f"<input class='kennelish_input'{' required' if entry.get('required') else ' '}{regex_pattern} name='{key}' type='{'text' if inp_type == 'nid' else inp_type}' value='"
+        after = f"' placeholder='{entry.get('label', '')}' />" + after
+
+        if not entry.get("prefill", True):
+            return before + after
+
+        return slot(lambda user_data: f"{before}{Kennelish.text_value(user_data, key)}{after}")
+
+    def text_value(user_data, key):
+        # Same special rule for email discovery as text().
+        if key == "email":
+            if user_data.get("email"):
+                prefill = user_data.get("email")
+            else:
+                prefill = user_data.get("discord").get("email")
+        else:
+            prefill = user_data.get(key, "")
+
+        return "" if prefill is None else prefill
+
+    def compile_choices(entry, kind, options, prefix=""):
+        """
+        Shared by radio and slider: returns a function of the prefill value that
+        renders the fieldset, with everything but the `checked` attributes done once.
+        """
+        key = entry.get("key", "")
+        ident = key.replace(".", "_").replace(" ", "_")
+
+        before, after = Kennelish.label_parts(entry)
+        before += f"{prefix}<fieldset name='{key}'{' required' if entry.get('required') else ' '} class='kennelish_input {kind}'>"
+        after = "</fieldset>" + after
+        choices = [
+            (
+                option,
+                f" name='{key}' id='radio_{ident}_{option}' value='{option}'><label for='radio_{ident}_{option}'>{option}</label></div>",
+            )
+            for option in options
+        ]
+
+        def fill(value):
+            output = [before]
+            for option, rest in choices:
+                selected = "" if option != value else "checked"
+                output.append(f"<div><input type='radio' {selected}{rest}")
+            output.append(after)
+            return "".join(output)
+
+        return fill
+
+    def compile_radio(entry):
+        fill = Kennelish.compile_choices(entry, "radio", entry["options"])
+        if not entry.get("prefill", True):
+            return fill("")
+
+        key = entry.get("key", "")
+        return slot(lambda user_data: fill(Kennelish.radio_value(user_data, key)))
+
+    def radio_value(user_data, key):
+        prefill = user_data.get(key, "")
+        if str(prefill) == "True":
+            prefill = "Yes"
+        elif str(prefill) == "False":
+            prefill = "No"
+        return prefill
+
+    def compile_slider(entry):
+        novice_label = entry.get("novice_label", "Novice")
+        expert_label = entry.get("expert_label", "Expert")
+        captions = f"<span class='caption'>{novice_label}</span><span class='right caption'>{expert_label}</span><br>"
+
+        fill = Kennelish.compile_choices(entry, "radio gridded", range(1, 6), captions)
+        if not entry.get("prefill", True):
+            return fill("")
+
+        key = entry.get("key", "")
+        return slot(lambda user_data: fill(user_data.get(key, "")))
+
+    def compile_dropdown(entry):
+        key = entry.get("key", "")
+
+        before, after = Kennelish.label_parts(entry)
+        before += f"<select class='kennelish_input'{' required' if entry.get('required') else ' '} name='{key}'><option disabled "
+        middle = "value='_default'>Select...</option>"
+        options = [(option, f"value='{option}'>{option}</option>") for option in entry.get("options")]
+
+        if entry.get("other"):
+            after = f"<option value='_other'>Other</option></select><input id='{key.replace('.', '_').replace(' ', '_')}' class='other_dropdown' type='text' placeholder='{entry.get('label', 'Other')}...'>" + after
+        else:
+            after = "</select>" + after
+
+        def fill(prefill):
+            output = [before, "selected " if prefill == "_default" else "", middle]
+            for option, rest in options:
+                output.append(f"<option {'selected ' if prefill == option else ''}{rest}")
+            output.append(after)
+            return "".join(output)
+
+        if not entry.get("prefill", True):
+            return fill("_default")
+
+        return slot(lambda user_data: fill(Kennelish.dropdown_value(user_data, key)))
+
+    def dropdown_value(user_data, key):
+        prefill = user_data.get(key, "_default")
+        return "_default" if prefill == "" else prefill
+
+    def prefill_fields(obj):
+        """
+        (input, key) for every prefilled element of a body, for `prefill()`.
+        """
+        fields = []
+        for entry in obj:
+            kind = entry.get("input")
+            if kind in ("h1", "h2", "h3", "p"):
+                fields.extend(Kennelish.prefill_fields(entry.get("elements", [])))
+            elif kind in PREFILLED and (kind == "signature" or entry.get("prefill", True)):
+                fields.append((kind, entry.get("key", "")))
+        return fields
+
+    def prefill(fields, user_data):
+        """
+        The member's values for a form rendered in the browser (static/form.js): what
+        the compiled template would fill in, as JSON. Text values are sent as they'd
+        appear in the input; choices are sent as-is, for the client to compare with
+        the options. A value that can't be worked out is left out.
+        """
+        values = {}
+        signature = None
+        for kind, key in fields:
+            try:
+                if kind == "signature":
+                    signature = Kennelish.signature_name(user_data)
+                elif kind in ("email", "nid", "text"):
+                    values[key] = f"{Kennelish.text_value(user_data, key)}"
+                elif kind == "radio":
+                    values[key] = Kennelish.radio_value(user_data, key)
+                elif kind == "dropdown":
+                    values[key] = Kennelish.dropdown_value(user_data, key)
+                else:
+                    values[key] = user_data.get(key, "")
+            except Exception as e:
+                logger.exception(e)
+
+        return {"values": values, "signature": signature}
+
+
+MALFORMED = Kennelish.invalid({"input": "Malformed object"})
+
+# Inputs whose markup depends on the member.
+PREFILLED = {"email", "nid", "text", "radio", "dropdown", "slider", "signature"}
+
+
+def slot(fill):
+    """
+    Wraps a prefill function so a failure renders as a malformed element, like
+    `Kennelish.parse()` does, instead of failing the whole page.
+    """
+
+    def render(user_data):
+        try:
+            return fill(user_data)
+        except Exception as e:
+            logger.exception(e)
+            return MALFORMED
+
+    return render
+
+
+class Template:
+    """
+    A compiled Kennelish form: static markup with prefill slots.
+    """
+
+    def __init__(self, parts):
+        # Merge neighbouring strings, so rendering is one join over few parts.
+        self.parts = []
+        for part in parts:
+            if isinstance(part, str) and self.parts and isinstance(self.parts[-1], str):
+                self.parts[-1] += part
+            else:
+                self.parts.append(part)
+
+    def render(self, user_data=None) -> str:
+        return "".join(
+            [part if isinstance(part, str) else part(user_data) for part in self.parts]
+        )
+
 
 class Transformer:
     """
@@ -4,6 +4,8 @@ from functools import wraps
 import redis
 from fastapi import HTTPException, Request, status
 
+from util.aio import run_sync
+
 
 class RateLimiter:
     def __init__(self, redis_host: str, redis_port: int, db: int):
@@ -44,7 +46,9 @@ class RateLimiter:
                         detail="User ID not found in payload",
                     )
                 key = f"rate_limit:{user_id}:{request_path}"
-                if self.is_rate_limited(key, max_requests, window):
+                if await run_sync(
+                    self.is_rate_limited, key, max_requests, window, pool="database"
+                ):
                     raise HTTPException(
                         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                         detail="Too many requests",
@@ -0,0 +1,107 @@
+"""
+One-off data migrations for the members table.
+
+Run from the repository root, e.g.:
+    python3 -m util.migrate discord_id
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from util.aio import run_sync
+from util.database import VersionConflict, members
+
+logger = logging.getLogger(__name__)
+
+
+class Migrate:
+    def __init__(self):
+        pass
+
+    async def discord_id(checkpoint_path="discord_id_migration.json"):
+        """
+        Rewrites legacy integer `discord_id` values as strings, which is what the
+        `discord_id` secondary index (and everything else) expects.
+
+        Writes go through the member repository, so each one bumps the member's
+        version and is published on the change feed. Running workers only hear about
+        it over Redis (`changefeed.redis`); without it their caches catch up within
+        `cache.members.ttl` and the roster and stats at their next reconciliation.
+
+        This is resumable: the scan position is saved to `checkpoint_path` after every
+        page, so an interrupted run picks up where it left off. Delete the checkpoint
+        to start over.
+        """
+        start_key = None
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r") as f:
+                start_key = json.load(f).get("last_evaluated_key")
+            logger.info(f"Resuming from {start_key}")
+
+        fixed = skipped = 0
+        while True:
+            items, start_key = await run_sync(
+                members.scan_page,
+                exclusive_start_key=start_key,
+                ProjectionExpression="id, discord_id",
+                FilterExpression="attribute_type(discord_id, :n)",
+                ExpressionAttributeValues={":n": "N"},
+                pool="database",
+            )
+
+            for item in items:
+                # Reads already hand the number back as a string.
+                old_id = item.get("discord_id")
+                try:
+                    # Only rewrite if nobody has changed it in the meantime; the int
+                    # serializes to the stored N.
+                    await members.update(
+                        item.get("id"),
+                        {"discord_id": str(old_id)},
+                        condition="discord_id = :old",
+                        condition_values={":old": int(old_id)},
+                    )
+                    fixed += 1
+                except VersionConflict:
+                    skipped += 1
+
+            with open(checkpoint_path, "w") as f:
+                json.dump({"last_evaluated_key": start_key}, f)
+
+            if not start_key:
+                break
+
+        logger.info(
+            f"Migrated {fixed} legacy Discord IDs ({skipped} changed by someone else)."
+        )
+
+        left = await run_sync(Migrate.count_numeric_discord_ids, pool="database")
+        if left:
+            logger.warning(f"{left} Discord IDs are still numbers; run again.")
+        return fixed
+
+    def count_numeric_discord_ids() -> int:
+        count = 0
+        start_key = None
+        while True:
+            items, start_key = members.scan_page(
+                exclusive_start_key=start_key,
+                ProjectionExpression="id",
+                FilterExpression="attribute_type(discord_id, :n)",
+                ExpressionAttributeValues={":n": "N"},
+            )
+            count += len(items)
+            if not start_key:
+                return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    migrations = {"discord_id": Migrate.discord_id}
+    if len(sys.argv) != 2 or sys.argv[1] not in migrations:
+        sys.exit(f"Usage: python3 -m util.migrate [{'|'.join(migrations)}]")
+
+    asyncio.run(migrations[sys.argv[1]]())
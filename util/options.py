@@ -1,7 +1,292 @@
-import json
+import logging
 import os
+import sys
+import threading
+import time
+from typing import Optional
 
+import redis
 import yaml
+from pydantic import BaseModel, Extra, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class Section(BaseModel):
+    """
+    A block of config/options.yml. Unknown keys are kept, so older and newer option
+    files both load.
+
+    Read values as attributes (`settings.jwt.lifetime.sudo`). `.get()` and `[]` work
+    like they do on the dicts options used to be, for code that hasn't moved over; as
+    with a blank value in the YAML, an unset (None) field gives `.get()`'s default.
+    """
+
+    class Config:
+        extra = Extra.allow
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+
+class JWTLifetime(Section):
+    user: int = 9072000
+    sudo: int = 86400
+
+
+class JWTSettings(Section):
+    secret: Optional[str] = None
+    algorithm: str = "HS256"
+    lifetime: JWTLifetime = JWTLifetime()
+    cache_size: int = 4096
+
+
+class SessionSettings(Section):
+    ttl: int = 1209600
+
+
+class RevocationSettings(Section):
+    capacity: int = 10000
+    error_rate: float = 0.001
+
+
+class HTTPSettings(Section):
+    domain: Optional[str] = None
+    timeout: float = 10
+
+
+class InfraAD(Section):
+    application_credential_id: Optional[str] = None
+    application_credential_secret: Optional[str] = None
+    username: Optional[str] = None
+    password: Optional[str] = None
+
+
+class InfraSettings(Section):
+    wifi: Optional[str] = ""
+    horizon: Optional[str] = None
+    ad: InfraAD = InfraAD()
+    tf_directory: str = "./"
+
+
+class DiscordSettings(Section):
+    client_id: Optional[str] = None
+    secret: Optional[str] = None
+    redirect_base: Optional[str] = None
+    scope: str = "email identify guilds.join"
+    bot_token: Optional[str] = None
+    guild_id: Optional[str] = None
+    member_role: Optional[str] = None
+
+
+class StripeURLs(Section):
+    success: Optional[str] = None
+    failure: Optional[str] = None
+
+
+class StripeSettings(Section):
+    api_key: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    price_id: Optional[str] = None
+    url: StripeURLs = StripeURLs()
+
+
+class DynamoDBSettings(Section):
+    table: str = "hackucf_members"
+    max_pool_connections: int = 50
+    discord_id_index: str = "discord_id-index"
+    email_index: str = "email-index"
+    scan_segments: int = 4
+
+
+class AWSSettings(Section):
+    dynamodb: DynamoDBSettings = DynamoDBSettings()
+
+
+class EmailSettings(Section):
+    smtp_server: Optional[str] = None
+    email: Optional[str] = None
+    password: Optional[str] = None
+
+
+class ChangeFeedSettings(Section):
+    redis: bool = False
+    channel: str = "onboard:members"
+
+
+class StatsSettings(Section):
+    reconcile_interval: int = 3600
+
+
+class MemberCacheSettings(Section):
+    size: int = 2048
+    ttl: int = 30
+    redis: bool = False
+
+
+class CacheSettings(Section):
+    members: MemberCacheSettings = MemberCacheSettings()
+
+
+class RedisSettings(Section):
+    host: str = "localhost"
+    port: int = 6379
+    db: int = 0
+
+
+class ThreadSettings(Section):
+    database: int = 32
+    external: int = 16
+
+
+class ReloadSettings(Section):
+    watch_interval: float = 2
+    redis: bool = False
+    channel: str = "onboard:options"
+
+
+class FormSettings(Section):
+    client_render: bool = False
+
+
+class Settings(Section):
+    jwt: JWTSettings = JWTSettings()
+    sessions: SessionSettings = SessionSettings()
+    revocation: RevocationSettings = RevocationSettings()
+    http: HTTPSettings = HTTPSettings()
+    infra: InfraSettings = InfraSettings()
+    discord: DiscordSettings = DiscordSettings()
+    stripe: StripeSettings = StripeSettings()
+    aws: AWSSettings = AWSSettings()
+    email: EmailSettings = EmailSettings()
+    changefeed: ChangeFeedSettings = ChangeFeedSettings()
+    stats: StatsSettings = StatsSettings()
+    cache: CacheSettings = CacheSettings()
+    redis: RedisSettings = RedisSettings()
+    threads: ThreadSettings = ThreadSettings()
+    reload: ReloadSettings = ReloadSettings()
+    forms: FormSettings = FormSettings()
+
+
+class SettingsFile:
+    """
+    Settings parsed from one options file, reloaded when the file changes.
+
+    The file is parsed and validated once. `watch()` starts a thread that reloads it
+    when its mtime changes and, with `reload.redis` on, straight away when a reload is
+    announced (see `python3 -m util.options reload`), so every worker picks up edits.
+    A file that fails to parse or validate is logged and the previous settings stay.
+
+    Only values read at request time follow reloads. Things built once at startup
+    (thread pools, redis pools, the DynamoDB client) need a restart.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.listeners = []
+        self.thread = None
+        self.lock = threading.Lock()
+
+        self.settings = self.load()
+
+    def load(self) -> Settings:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r") as file:
+            settings = Settings.parse_obj(yaml.safe_load(file) or {})
+
+        self.mtime = mtime
+        return settings
+
+    def reload(self, force: bool = False):
+        with self.lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if not force and mtime == self.mtime:
+                    return
+                # Set first, so a broken file is reported once rather than every poll.
+                self.mtime = mtime
+                settings = self.load()
+            except (OSError, yaml.YAMLError, ValidationError) as e:
+                logger.error(f"Could not reload {self.path}, keeping old options: {e}")
+                return
+
+            # Swap the sections into the existing object, so every module's reference
+            # to it sees the new values.
+            self.settings.__dict__.update(settings.__dict__)
+
+        logger.info(f"Reloaded {self.path}.")
+        for listener in self.listeners:
+            try:
+                listener(self.settings)
+            except Exception as e:
+                logger.exception(e)
+
+    def on_reload(self, listener):
+        """
+        Registers `listener(settings)` to run after every successful reload.
+        """
+        self.listeners.append(listener)
+
+    def poll(self):
+        while True:
+            time.sleep(self.settings.reload.watch_interval)
+            self.reload()
+
+    def subscribe(self):
+        while True:
+            try:
+                conn = redis.Redis(
+                    host=self.settings.redis.host,
+                    port=self.settings.redis.port,
+                    db=self.settings.redis.db,
+                )
+                pubsub = conn.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.settings.reload.channel)
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.reload(force=True)
+            except Exception as e:
+                logger.warning(f"Options reload subscription failed: {e}")
+                time.sleep(5)
+
+    def watch(self):
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.poll, name="options", daemon=True)
+        self.thread.start()
+        if self.settings.reload.redis:
+            threading.Thread(
+                target=self.subscribe, name="options-pubsub", daemon=True
+            ).start()
+
+    def announce(self):
+        """
+        Tells every worker to reload now.
+        """
+        redis.Redis(
+            host=self.settings.redis.host,
+            port=self.settings.redis.port,
+            db=self.settings.redis.db,
+        ).publish(self.settings.reload.channel, "reload")
+
+
+files = {}
+
+
+def settings_file(path: str = "config/options.yml") -> SettingsFile:
+    full_path = os.path.join(os.getcwd(), path)
+    if full_path not in files:
+        files[full_path] = SettingsFile(full_path)
+    return files[full_path]
 
 
 class Options:
@@ -9,23 +294,28 @@ class Options:
         super(Options, self).__init__
 
     def fetch(path="config/options.yml"):
-        # Get file path
-        full_path = os.path.join(os.getcwd(), path)
+        """
+        Returns the live settings for an options file. Parsed once per process.
+        """
+        return settings_file(path).settings
 
-        # Load options.
-        with open(full_path, "r") as file:
-            options = yaml.safe_load(file)
+    def get(self, arg=None):
+        return Options.fetch().get(arg, None)
 
-        return options
+    def get_form_body(file="1"):
+        """
+        Returns a form's Kennelish body from the in-memory registry, or {} if there is
+        no such form. Don't mutate it; it's shared between requests.
+        """
+        # Imported here: util.forms is loaded lazily so options stay import-cycle free.
+        from util.forms import forms
 
-    def get(self, arg=None):
-        options = self.fetch()
+        return forms.body(str(file))
 
-        return options.get(arg, None)
 
-    def get_form_body(file="1"):
-        try:
-            form_file = os.path.join(os.getcwd(), "forms", f"{file}.json")
-            return json.load(open(form_file, "r"))
-        except FileNotFoundError:
-            return {}
+if __name__ == "__main__":
+    # python3 -m util.options reload
+    if sys.argv[1:] == ["reload"]:
+        settings_file().announce()
+    else:
+        print("Usage: python3 -m util.options reload")
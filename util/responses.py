@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def json_default(obj):
+    """
+    Encodes the few non-JSON types a member record can hold.
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Return it directly from a route (rather than a dict) to also skip FastAPI's
+    jsonable_encoder pass, which is most of the cost of sending member records. The
+    content must already be plain data, e.g. records from util.database.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import threading
+import time
+
+import redis
+
+from util.bloom import BloomFilter
+from util.options import Options
+from util.sessions import unavailable
+
+logger = logging.getLogger(__name__)
+
+options = Options.fetch()
+
+
+class RevocationList:
+    """
+    Revoked JWTs, so a leaked token can be killed without rotating the secret.
+
+    The list lives in Redis as a sorted set of token hashes scored by when the token
+    would have expired anyway, so old entries can be pruned. Each worker mirrors it into
+    a Bloom filter that is filled on startup and kept current over pub/sub: the common
+    case (a token that was never revoked) is a local bit check, and only probable hits
+    are confirmed with Redis. Until the filter is loaded every check goes to Redis.
+    """
+
+    def __init__(
+        self,
+        redis_host: str,
+        redis_port: int = 6379,
+        redis_db: int = 0,
+        key: str = "revoked_tokens",
+        channel: str = "onboard:revocations",
+        capacity: int = 10000,
+        error_rate: float = 0.001,
+    ):
+        self.key = key
+        self.channel = channel
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.redis_pool = redis.ConnectionPool(
+            host=redis_host, port=redis_port, db=redis_db
+        )
+
+        self.bloom = None
+        self.pubsub = None
+        self.thread = None
+
+    def get_redis(self):
+        return redis.Redis(connection_pool=self.redis_pool)
+
+    def digest(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def revoke(self, token: str, expires_at: float):
+        """
+        Revokes a token until `expires_at`, after which it is invalid anyway.
+        """
+        digest = self.digest(token)
+        try:
+            with self.get_redis().pipeline() as pipe:
+                pipe.zadd(self.key, {digest: expires_at})
+                pipe.zremrangebyscore(self.key, 0, time.time())
+                pipe.publish(self.channel, digest)
+                pipe.execute()
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+        if self.bloom is not None:
+            self.bloom.add(digest)
+
+    def might_be_revoked(self, token: str) -> bool:
+        """
+        Local check. False means definitely not revoked.
+        """
+        return self.bloom is None or self.digest(token) in self.bloom
+
+    def is_revoked(self, token: str) -> bool:
+        """
+        Authoritative check against Redis.
+        """
+        try:
+            return self.get_redis().zscore(self.key, self.digest(token)) is not None
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+    def load(self):
+        """
+        Rebuilds the Bloom filter from Redis.
+        """
+        digests = self.get_redis().zrangebyscore(self.key, time.time(), "+inf")
+
+        bloom = BloomFilter(max(self.capacity, 2 * len(digests)), self.error_rate)
+        for digest in digests:
+            bloom.add(digest.decode())
+        self.bloom = bloom
+
+        logger.info(f"Loaded {len(digests)} revoked token(s).")
+
+    def listen(self):
+        while self.pubsub is not None:
+            try:
+                # Subscribe before loading, so nothing revoked in between is missed.
+                self.pubsub.subscribe(self.channel)
+                self.load()
+                for message in self.pubsub.listen():
+                    if message["type"] == "message":
+                        self.bloom.add(message["data"].decode())
+            except Exception as e:
+                if self.pubsub is None:
+                    return
+                logger.warning(f"Revocation list subscription failed: {e}")
+                time.sleep(1)
+
+    def start(self):
+        if self.thread is not None:
+            return
+
+        self.pubsub = self.get_redis().pubsub(ignore_subscribe_messages=True)
+        self.thread = threading.Thread(
+            target=self.listen, name="revocations", daemon=True
+        )
+        self.thread.start()
+
+    def close(self):
+        pubsub, self.pubsub = self.pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+        self.thread = None
+
+
+revocations = RevocationList(
+    redis_host=options.get("redis").get("host"),
+    redis_port=options.get("redis").get("port"),
+    redis_db=options.get("redis").get("db"),
+    capacity=options.get("revocation", {}).get("capacity", 10000),
+    error_rate=options.get("revocation", {}).get("error_rate", 0.001),
+)
@@ -0,0 +1,268 @@
+import asyncio
+import base64
+import bisect
+import logging
+import re
+import threading
+from collections import defaultdict
+
+from models.record import MemberRecord
+from util.aio import run_sync
+from util.changefeed import changes
+from util.database import members
+
+logger = logging.getLogger(__name__)
+
+# What the admin roster shows for each member. Full records are fetched on demand.
+SUMMARY_FIELDS = MemberRecord.paths()
+
+# What the search box matches against.
+SEARCH_FIELDS = ["first_name", "surname", "nid", "discord.username", "email", "infra_email"]
+
+# What the admin table can filter on; each (field, value) keeps its own posting set.
+FILTER_FIELDS = ["did_pay_dues", "is_full_member", "did_get_shirt", "class_standing"]
+
+
+def sort_key(record: MemberRecord) -> tuple:
+    """
+    Position of a record in the roster's join_date order. The id breaks ties.
+    """
+    return (record.join_date or 0, record.id)
+
+
+def passes_filters(record: MemberRecord, filters: dict) -> bool:
+    """
+    Checks a record against {attribute: value} filters. An unset attribute matches
+    nothing, not even False.
+    """
+    return all(record.get(key) == value for key, value in filters.items())
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(f"{key[0]}:{key[1]}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Reverses encode_cursor. Raises ValueError on anything that isn't a cursor.
+    """
+    try:
+        decoded = base64.urlsafe_b64decode(cursor.encode()).decode()
+        join_date, member_id = decoded.split(":", 1)
+        return (int(join_date), member_id)
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+
+
+class RosterIndex:
+    """
+    In-memory search index over member summaries, for the admin roster.
+
+    Every searchable value is broken into trigrams, plus one- and two-letter prefixes of
+    each word for very short queries. A search intersects the posting sets of its
+    terms and then confirms matches with a substring check, so lookups never touch
+    DynamoDB and take well under a millisecond for a roster our size.
+
+    Members are also kept in a list sorted by join_date, which the admin table pages
+    through with cursors instead of scanning the table for every page.
+
+    The index is built once from a scan and then kept current from the member change
+    feed.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.text = {}
+        self.keys = {}
+        self.postings = defaultdict(set)
+        self.filters = defaultdict(set)
+        self.order = []
+        self.lock = threading.RLock()
+
+        self.ready = False
+        self.building = None
+
+    def index_keys(self, text: str) -> set:
+        keys = set()
+        for value in text.split("\0"):
+            keys.update(value[i : i + 3] for i in range(len(value) - 2))
+            for word in re.split(r"[^0-9a-z]+", value):
+                keys.update(word[:n] for n in (1, 2) if len(word) >= n)
+        return keys
+
+    def upsert(self, item: dict):
+        member_id = item.get("id")
+        if not member_id:
+            return
+
+        record = MemberRecord.from_item(item)
+        text = "\0".join(str(record.get(path, "")).lower() for path in SEARCH_FIELDS)
+        keys = self.index_keys(text)
+
+        with self.lock:
+            # A scan that started before a write must not overwrite the newer record.
+            current = self.records.get(member_id)
+            if current and (current.version or 0) > (record.version or 0):
+                return
+
+            self.remove(member_id)
+            self.records[member_id] = record
+            self.text[member_id] = text
+            self.keys[member_id] = keys
+            for key in keys:
+                self.postings[key].add(member_id)
+            for field in FILTER_FIELDS:
+                if record.get(field) is not None:
+                    self.filters[(field, record.get(field))].add(member_id)
+            bisect.insort(self.order, sort_key(record))
+
+    def remove(self, member_id: str):
+        with self.lock:
+            record = self.records.pop(member_id, None)
+            if record:
+                key = sort_key(record)
+                i = bisect.bisect_left(self.order, key)
+                if i < len(self.order) and self.order[i] == key:
+                    del self.order[i]
+                for field in FILTER_FIELDS:
+                    posting = (field, record.get(field))
+                    self.filters[posting].discard(member_id)
+                    if not self.filters[posting]:
+                        del self.filters[posting]
+
+            self.text.pop(member_id, None)
+            for key in self.keys.pop(member_id, ()):
+                self.postings[key].discard(member_id)
+                if not self.postings[key]:
+                    del self.postings[key]
+
+    def on_change(self, event: dict):
+        if event["new"]:
+            self.upsert(event["new"])
+        else:
+            self.remove(event["member_id"])
+
+    def search(self, query: str, limit: int = 50) -> list:
+        """
+        Returns up to `limit` member summaries matching every word of `query`.
+        """
+        terms = query.lower().split()
+
+        with self.lock:
+            if not terms:
+                records = list(self.records.values())[:limit]
+                return [record.dict() for record in records]
+
+            matches = None
+            for term in terms:
+                if len(term) < 3:
+                    found = set(self.postings.get(term, ()))
+                else:
+                    grams = [term[i : i + 3] for i in range(len(term) - 2)]
+                    found = set.intersection(
+                        *[self.postings.get(gram, set()) for gram in grams]
+                    )
+                    found = {i for i in found if term in self.text[i]}
+
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+
+            return [self.records[i].dict() for i in list(matches)[:limit]]
+
+    def matching(self, filters: dict) -> set:
+        """
+        Ids of the members passing every filter. Call with the lock held, and don't
+        modify the result.
+        """
+        matched = None
+        for field, value in filters.items():
+            if field in FILTER_FIELDS:
+                found = self.filters.get((field, value), set())
+            else:
+                found = {
+                    member_id
+                    for member_id, record in self.records.items()
+                    if passes_filters(record, {field: value})
+                }
+            matched = found if matched is None else matched & found
+        return matched
+
+    def page(
+        self,
+        cursor: str = None,
+        limit: int = 50,
+        descending: bool = False,
+        filters: dict = None,
+    ):
+        """
+        Returns (summaries, next_cursor, total) for one page of the roster in join_date
+        order, where `total` counts every member passing the filters.
+
+        `filters` maps attribute names to the value they must equal. `next_cursor` is
+        None on the last page. Writes between pages never cause skips or repeats of
+        members whose join_date did not change.
+        """
+        after = decode_cursor(cursor) if cursor else None
+
+        with self.lock:
+            order, matched, total = self.order, None, len(self.records)
+            if filters:
+                matched = self.matching(filters)
+                total = len(matched)
+                # Walking the roster passes about len(order) / len(matched) members per
+                # match; when matches are that sparse, sorting them is cheaper.
+                if len(matched) ** 2 < len(order) * limit:
+                    order = sorted(sort_key(self.records[i]) for i in matched)
+                    matched = None
+
+            if descending:
+                start = bisect.bisect_left(order, after) - 1 if after else len(order) - 1
+                positions = range(start, -1, -1)
+            else:
+                start = bisect.bisect_right(order, after) if after else 0
+                positions = range(start, len(order))
+
+            picked = []
+            for i in positions:
+                if matched is None or order[i][1] in matched:
+                    picked.append(order[i])
+                    if len(picked) > limit:
+                        break
+
+            records = [self.records[key[1]] for key in picked[:limit]]
+
+        # Records are read-only, so the JSON-shaped copies are built without the lock.
+        data = [record.dict() for record in records]
+        next_cursor = encode_cursor(picked[limit - 1]) if len(picked) > limit else None
+        return data, next_cursor, total
+
+    def build(self):
+        """
+        Fills the index from a full table scan. Blocks; run it on a worker thread.
+        """
+        count = 0
+        for item in members.scan_iter(**members.projection(SUMMARY_FIELDS)):
+            self.upsert(item)
+            count += 1
+
+        self.ready = True
+        logger.info(f"Roster index built with {count} members.")
+
+    async def ensure_ready(self):
+        """
+        Builds the index if it hasn't been already. Concurrent callers share one build.
+        """
+        if self.ready:
+            return
+
+        if self.building is None or (
+            self.building.done() and self.building.exception()
+        ):
+            self.building = asyncio.ensure_future(run_sync(self.build, pool="database"))
+
+        await asyncio.shield(self.building)
+
+
+roster = RosterIndex()
+changes.subscribe(roster.on_change)
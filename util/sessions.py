@@ -0,0 +1,113 @@
+import json
+import secrets
+
+import redis
+from fastapi import HTTPException, status
+
+from util.options import Options
+
+options = Options.fetch()
+
+
+def unavailable(e: redis.RedisError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Redis error: {str(e)}",
+    )
+
+
+class SessionStore:
+    """
+    Server-side login sessions, kept in Redis.
+
+    The browser only holds an opaque session id in the `token` cookie; the claims that
+    used to travel inside the JWT (Discord token, name, avatar, ...) live in Redis under
+    `session:<id>`. Every read pushes the expiry back (sliding expiry), and each
+    member's session ids are tracked in `sessions:<member id>` so that all of them can
+    be revoked at once.
+
+    Absolute lifetimes (`jwt.lifetime.user` / `.sudo`, counted from the `issued` claim)
+    are still enforced by util.authentication.
+    """
+
+    def __init__(
+        self,
+        redis_host: str,
+        redis_port: int = 6379,
+        redis_db: int = 0,
+        ttl: int = 1209600,
+        lifetime: int = 9072000,
+    ):
+        self.ttl = ttl
+        self.lifetime = lifetime
+        self.redis_pool = redis.ConnectionPool(
+            host=redis_host, port=redis_port, db=redis_db
+        )
+
+    def get_redis(self):
+        return redis.Redis(connection_pool=self.redis_pool)
+
+    def is_session_id(self, token: str) -> bool:
+        # JWTs always contain dots; session ids never do.
+        return "." not in token
+
+    def create(self, claims: dict) -> str:
+        """
+        Stores `claims` under a new session id and returns the id.
+        """
+        session_id = secrets.token_urlsafe(24)
+        try:
+            with self.get_redis().pipeline() as pipe:
+                pipe.set(f"session:{session_id}", json.dumps(claims), ex=self.ttl)
+                pipe.sadd(f"sessions:{claims['id']}", session_id)
+                # No session can outlive the absolute lifetime, however often it's used.
+                pipe.expire(f"sessions:{claims['id']}", self.lifetime)
+                pipe.execute()
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+        return session_id
+
+    def get(self, session_id: str):
+        """
+        Returns the session's claims and extends it, or None if there is no such
+        session (expired, revoked or made up).
+        """
+        try:
+            blob = self.get_redis().getex(f"session:{session_id}", ex=self.ttl)
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+        return json.loads(blob) if blob is not None else None
+
+    def revoke(self, session_id: str):
+        try:
+            self.get_redis().delete(f"session:{session_id}")
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+    def revoke_member(self, member_id: str) -> int:
+        """
+        Ends every session of a member. Returns how many were still alive.
+        """
+        try:
+            conn = self.get_redis()
+            session_ids = conn.smembers(f"sessions:{member_id}")
+            with conn.pipeline() as pipe:
+                for session_id in session_ids:
+                    pipe.delete(f"session:{session_id.decode()}")
+                pipe.delete(f"sessions:{member_id}")
+                results = pipe.execute()
+        except redis.RedisError as e:
+            raise unavailable(e) from e
+
+        return sum(results[:-1])
+
+
+sessions = SessionStore(
+    redis_host=options.get("redis").get("host"),
+    redis_port=options.get("redis").get("port"),
+    redis_db=options.get("redis").get("db"),
+    ttl=options.get("sessions", {}).get("ttl", 1209600),
+    lifetime=options.get("jwt").get("lifetime").get("user"),
+)
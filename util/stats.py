@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+
+from models.record import MemberRecord
+from util.aio import run_sync
+from util.changefeed import changes
+from util.database import members
+from util.options import Options
+
+logger = logging.getLogger(__name__)
+
+options = Options.fetch()
+
+# Yes/no attributes that are counted.
+FLAGS = ["did_pay_dues", "is_full_member", "did_get_shirt"]
+
+# Attributes that are counted per distinct value.
+BREAKDOWNS = ["major", "class_standing"]
+
+FIELDS = ["id", "version"] + FLAGS + BREAKDOWNS
+
+
+class MemberStats:
+    """
+    Roster counters for the admin dashboard, kept current on every write.
+
+    Each event on the member change feed subtracts the old record's contribution and
+    adds the new one's, so reading the stats never touches DynamoDB. A periodic full
+    scan recomputes everything from scratch, to correct any drift from writes the feed
+    didn't carry (e.g. edits made in the AWS console).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = self.tally([])
+
+        # Writes seen while a reconciliation scan is running, by member id.
+        self.dirty = None
+
+        self.ready = False
+        self.building = None
+        self.reconciled_at = None
+
+    def tally(self, records) -> dict:
+        counts = {"total": 0, **{flag: 0 for flag in FLAGS}}
+        counts.update({field: Counter() for field in BREAKDOWNS})
+        for record in records:
+            self.count(counts, record, 1)
+        return counts
+
+    def count(self, counts: dict, record: dict, sign: int):
+        counts["total"] += sign
+        for flag in FLAGS:
+            if record.get(flag):
+                counts[flag] += sign
+        for field in BREAKDOWNS:
+            value = str(record.get(field) or "")
+            counts[field][value] += sign
+            if not counts[field][value]:
+                del counts[field][value]
+
+    def on_change(self, event: dict):
+        old, new = event["old"], event["new"]
+        with self.lock:
+            if old:
+                self.count(self.counts, old, -1)
+            if new:
+                self.count(self.counts, new, 1)
+                if self.dirty is not None:
+                    self.dirty[new["id"]] = MemberRecord.from_item(new)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counts = {
+                key: dict(value) if isinstance(value, Counter) else value
+                for key, value in self.counts.items()
+            }
+
+        counts["unpaid"] = counts["total"] - counts["did_pay_dues"]
+        return counts
+
+    def reconcile(self):
+        """
+        Recounts everything from a full table scan. Blocks; run it on a worker thread.
+        """
+        with self.lock:
+            self.dirty = {}
+
+        records = {}
+        try:
+            for item in members.scan_iter(**members.projection(FIELDS)):
+                records[item["id"]] = MemberRecord.from_item(item)
+        except Exception:
+            with self.lock:
+                self.dirty = None
+            raise
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, None
+
+            # The scan may have read some members before a write that landed mid-scan.
+            for member_id, record in dirty.items():
+                scanned = records.get(member_id)
+                if not scanned or (scanned.version or 0) < (record.version or 0):
+                    records[member_id] = record
+
+            counts = self.tally(records.values())
+            if self.ready and counts != self.counts:
+                logger.warning("Member stats drifted; corrected by reconciliation.")
+
+            self.counts = counts
+            self.reconciled_at = time.time()
+            self.ready = True
+
+    async def ensure_ready(self):
+        """
+        Runs the first reconciliation if it hasn't happened yet. Concurrent callers
+        share one scan.
+        """
+        if self.ready:
+            return
+
+        if self.building is None or (
+            self.building.done() and self.building.exception()
+        ):
+            self.building = asyncio.ensure_future(
+                run_sync(self.reconcile, pool="database")
+            )
+
+        await asyncio.shield(self.building)
+
+    async def reconcile_forever(self):
+        """
+        Reconciles on startup and then every `stats.reconcile_interval` seconds.
+        """
+        interval = options.get("stats", {}).get("reconcile_interval", 3600)
+        while True:
+            try:
+                if self.ready:
+                    await run_sync(self.reconcile, pool="database")
+                else:
+                    await self.ensure_ready()
+            except Exception as e:
+                logger.exception(e)
+            await asyncio.sleep(interval)
+
+
+stats = MemberStats()
+changes.subscribe(stats.on_change)